@@ -1,49 +1,69 @@
+import time
+# Taken before the heavy imports below so cold-start timings cover them
+_PROCESS_STARTED = time.perf_counter()
+
 from urllib.parse import urlparse, urljoin
 
 from fastapi import FastAPI, HTTPException, Depends, Request, status
-from fastapi.responses import JSONResponse
+from fastapi import Query as QueryParam, Response as HTTPResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from jose import JWTError, jwt, ExpiredSignatureError
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-import litellm
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import asyncio
 import json
 import os
-import io
-import boto3
-from botocore.exceptions import ClientError
-
-from crawl4ai import (
-    CrawlerRunConfig,
-    LLMConfig,
-    LLMExtractionStrategy,
-    RegexExtractionStrategy,
-)
+import base64
+import hashlib
+import math
+
 from schemas import (
+    ModelVersionRequest,
     QueryRequest,
     ContactInfo,
     ContactExtractionResponse,
     PerSourceResult,
     UserCreate,
     Token,
-    TokenData,
     FeedbackRequest,
     ChatHistoryItem,
     EmailGenerateRequest,
     EmailResponse,
+    ExtractionJobResponse,
 )
 from services import (
     crawler,
+    crawl_cache,
+    crawl_scheduler,
+    page_store,
+    query_cache,
+    exa_cache,
     search_with_exa,
     get_important_internal_links,
+    find_pages_with_contacts,
+    extract_contacts_from_pages,
+    company_domain,
 )
-from lead_scorer import LeadRequest, predict_fit_score
-from db import User, Query, Response, get_db
+from lead_scorer import LeadRequest, embedding_cache
+from inference import inference_executor
+from llm_gateway import llm_gateway
+from jobs import ExtractionJobQueue, JobQueueFull
+from training_log import SegmentedJsonlLog, S3_JSONL_PREFIX
+from record_writer import TrainingRecordWriter
+from s3_client import SharedS3Client
+from caching import TTLCache
+from password_pool import PasswordHashPool, PasswordPoolBusy
+from rate_limit import TokenBucketLimiter
+from model_registry import registry, list_versions
+from db import User, Query, Response, CompanyProfile, AsyncSessionLocal, get_db, init_db, close_db, pool_stats
 
 # Auth setup
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")  # Load from env or use default
@@ -53,39 +73,45 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="signin")
 
+# Freshness policy for per-domain company profiles
+COMPANY_PROFILE_MAX_AGE = timedelta(hours=int(os.getenv("COMPANY_PROFILE_MAX_AGE_HOURS", "168")))
+COMPANY_PROFILE_EMPTY_MAX_AGE = timedelta(hours=int(os.getenv("COMPANY_PROFILE_EMPTY_MAX_AGE_HOURS", "24")))
+
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "outreachdata")
-S3_JSONL_KEY = os.getenv("S3_JSONL_KEY", "b2b_lead_data_india.jsonl")
+S3_JSONL_KEY = os.getenv("S3_JSONL_KEY", "b2b_lead_data_india.jsonl")  # legacy single-object log, read-only
 AWS_REGION = os.getenv("AWS_REGION")
 
+# One S3 client (and connection pool) for the whole process, opened in the lifespan
+shared_s3 = SharedS3Client(AWS_REGION)
+
 def _get_s3_client():
     if not S3_BUCKET_NAME:
         return None
-    session = boto3.session.Session(region_name=AWS_REGION) if AWS_REGION else boto3.session.Session()
-    return session.client("s3")
+    return shared_s3.client
 
 def _append_jsonl_records_to_s3(records):
     """
-    Append a list of JSON-serializable dicts to the configured S3 JSONL file.
-    Safe no-op if S3 is not configured.
+    Append a list of JSON-serializable dicts to the segmented S3 training log
+    as one new part object. Safe no-op if S3 is not configured.
+    Runs on the training writer's flush thread; errors propagate so the writer
+    can spill the batch to disk and retry later.
     """
     if not records:
         return
     s3 = _get_s3_client()
     if s3 is None:
         return
-    try:
-        existing_obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=S3_JSONL_KEY)
-        existing_bytes = existing_obj["Body"].read()
-    except ClientError as e:
-        # If the object doesn't exist, start from empty
-        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "NoSuchBucket"):
-            existing_bytes = b""
-        else:
-            # Fail soft: skip appending on unexpected S3 errors
-            return
-    new_lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
-    combined = existing_bytes + new_lines
-    s3.put_object(Bucket=S3_BUCKET_NAME, Key=S3_JSONL_KEY, Body=combined, ContentType="application/x-ndjson")
+    SegmentedJsonlLog(s3, S3_BUCKET_NAME, S3_JSONL_PREFIX, legacy_key=S3_JSONL_KEY).append(records)
+
+# Write-behind buffer: handlers enqueue, a background task flushes to S3 in batches
+training_writer = TrainingRecordWriter(
+    _append_jsonl_records_to_s3,
+    spill_path=os.getenv("TRAINING_SPILL_PATH", ".cache/training_spill.jsonl"),
+    flush_records=int(os.getenv("TRAINING_FLUSH_RECORDS", "200")),
+    flush_bytes=int(os.getenv("TRAINING_FLUSH_BYTES", str(1024 * 1024))),
+    flush_interval=float(os.getenv("TRAINING_FLUSH_INTERVAL_SECONDS", "30")),
+    max_pending_bytes=int(os.getenv("TRAINING_MAX_PENDING_BYTES", str(16 * 1024 * 1024))),
+)
 
 def _build_ml_jsonl_records(user_query: str, contacts_found: Dict[str, PerSourceResult]) -> List[dict]:
     """
@@ -94,8 +120,10 @@ def _build_ml_jsonl_records(user_query: str, contacts_found: Dict[str, PerSource
     - org_summary: str
     - contact_info: { email, phone, contact_title }
     - user_feedback: str (empty if unavailable)
+    - logged_at: ISO timestamp (UTC), used to partition the Parquet export
     """
     records = []
+    logged_at = datetime.utcnow().isoformat()
     for base_url, result in contacts_found.items():
         if not result.summary and not result.contacts:
             continue
@@ -113,15 +141,53 @@ def _build_ml_jsonl_records(user_query: str, contacts_found: Dict[str, PerSource
             "org_summary": result.summary or "",
             "contact_info": contact_info,
             "user_feedback": "",  # appended later via feedback endpoint if provided
+            "logged_at": logged_at,
         }
         records.append(record)
     return records
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def _score_sources(user_query: str, base_inputs: List[str], website_summaries: Dict[str, str], contact_infos: Dict[str, dict]) -> Dict[str, float]:
+    """
+    Score every base URL of a run as one batch on the inference executor.
+    """
+    companies = [
+        {"org_summary": website_summaries.get(base, ""), "contact_info": contact_infos.get(base, {})}
+        for base in base_inputs
+    ]
+    return dict(zip(base_inputs, await inference_executor.score(user_query, companies)))
+
+# pbkdf2 runs on a bounded thread pool so login bursts can't stall the event loop
+password_pool = PasswordHashPool(
+    pwd_context,
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_queue=int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64")),
+)
+# Per-account limit on signin/signup attempts
+login_limiter = TokenBucketLimiter(
+    rate_per_minute=float(os.getenv("LOGIN_RATE_PER_MINUTE", "10")),
+    burst=int(os.getenv("LOGIN_RATE_BURST", "5")),
+)
+
+def _check_login_rate(action: str, email: str):
+    retry_after = login_limiter.allow((action, email.strip().lower()))
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts for this account, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_pool.verify(plain_password, hashed_password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Authentication is busy, try again shortly", headers={"Retry-After": "1"})
+
+async def get_password_hash(password):
+    try:
+        return await password_pool.hash(password)
+    except PasswordPoolBusy:
+        raise HTTPException(status_code=503, detail="Authentication is busy, try again shortly", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -133,26 +199,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
+async def _user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await _user_by_email(db, email)
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await verify_password(password, user.password_hash):
         return False
     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Verified token -> user cache, keyed by token hash and tagged by email for invalidation.
+# Entries never outlive the token's own expiry.
+auth_cache = TTLCache(
+    max_entries=int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60")),
+)
+
+def invalidate_user_cache(email: str):
+    """Drop cached logins for a user; call whenever a users row changes."""
+    auth_cache.invalidate_tag(email)
+
+async def _user_for_token(db: AsyncSession, token: str) -> Optional[User]:
+    """
+    Verify a bearer token and load its user, from the auth cache when possible.
+    Raises ExpiredSignatureError / JWTError for bad tokens; None if the user is gone.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    user = auth_cache.get(key)
+    if user is not None:
+        return user
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    email: str = payload.get("sub")
+    if email is None:
+        raise JWTError("Token has no subject")
+    user = await _user_by_email(db, email)
+    if user is not None:
+        auth_cache.put(key, user, ttl=payload.get("exp", 0) - time.time(), tag=email)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer", "X-Redirect-To": "/auth/login"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
+        user = await _user_for_token(db, token)
     except ExpiredSignatureError:
         raise HTTPException(
             status_code=401,
@@ -161,49 +255,94 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         )
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.email == token_data.email).first()
     if user is None:
         raise credentials_exception
     return user
 
-def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user_optional(token: Optional[str] = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """Optional authentication - returns None if not authenticated"""
     if not token:
         return None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        user = db.query(User).filter(User.email == email).first()
-        return user
+        return await _user_for_token(db, token)
     except (JWTError, ExpiredSignatureError):
         return None
 
+# Accounts allowed to switch model versions (comma-separated emails)
+MODEL_ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("MODEL_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+def get_model_admin(current_user: User = Depends(get_current_user)):
+    if current_user.email.lower() not in MODEL_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not authorized to manage models")
+    return current_user
+
 async def generate_email_content(query: str, summary: str) -> dict:
     prompt = f"Generate a concise, professional outreach email that a potential client or partner can send to a company to express interest in their services or inquire about collaboration. Base the email on the user's search query: '{query}' and the company's summary: '{summary}'. Make the email personalized, engaging, and suitable for business outreach. Respond only with JSON in this format: {{'subject': 'subject text', 'body': 'body text'}}"
-    response = await litellm.acompletion(
-        model="gemini/gemini-2.0-flash",
-        messages=[{"role": "user", "content": prompt}],
-        api_key=os.getenv("GEMINI_API_KEY")
-    )
-    content = response.choices[0].message.content.strip()
-    # Remove ```json if present
-    if content.startswith("```json"):
-        content = content[7:]
-    if content.endswith("```"):
-        content = content[:-3]
-    data = json.loads(content)
-    return data
+    return await llm_gateway.complete_json(prompt, purpose="email_generation")
+
+CONTACT_EXTRACTION_INSTRUCTION = "Extract all contact information details from the text. For each person, provide their name, designation, email, and phone number. Do not include duplicate contacts. If two records share the same email or phone number, keep only the one that contains more information (name or designation) and discard the less informative one. Ensure the final output has only unique and most complete records."
+# Page markdown beyond this is cut before it is sent to the LLM
+LLM_EXTRACTION_MAX_CHARS = int(os.getenv("LLM_EXTRACTION_MAX_CHARS", "60000"))
+
+async def extract_contacts_with_llm(page_url: str, markdown: str):
+    prompt = f"""{CONTACT_EXTRACTION_INSTRUCTION}
+
+Respond only with a JSON array of objects matching this JSON schema:
+{json.dumps(ContactInfo.model_json_schema())}
+
+Page URL: {page_url}
+
+Page content:
+{markdown[:LLM_EXTRACTION_MAX_CHARS]}"""
+    return await llm_gateway.complete_json(prompt, purpose="contact_extraction")
 
 # --- FastAPI App Setup ---
+# Cold-start timings (milliseconds since the app module started importing)
+startup_timings: Dict[str, Optional[float]] = {"app_ready_ms": None, "first_request_ms": None, "models_ready_ms": None}
+
+def _elapsed_ms() -> float:
+    return round((time.perf_counter() - _PROCESS_STARTED) * 1000, 1)
+
+async def _load_models_in_background():
+    try:
+        await asyncio.to_thread(registry.load)
+        startup_timings["models_ready_ms"] = _elapsed_ms()
+    except Exception:
+        # Error is recorded on the registry and surfaced by /ready
+        pass
+
+# Seconds between checks for a newly promoted model version (0 disables hot-swap)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL_SECONDS", "60"))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    model_loader = asyncio.create_task(_load_models_in_background())
+    model_watcher = asyncio.create_task(registry.watch(MODEL_RELOAD_INTERVAL)) if MODEL_RELOAD_INTERVAL > 0 else None
+    await init_db()
+    inference_executor.start()
+    if S3_BUCKET_NAME:
+        shared_s3.start()
+    training_writer.start()
     await crawler.start()
+    job_queue.start()
+    startup_timings["app_ready_ms"] = _elapsed_ms()
+    print(f"API ready to serve after {startup_timings['app_ready_ms']}ms (models loading in background)")
     try:
         yield
     finally:
+        await job_queue.stop()
+        await crawl_scheduler.stop()
         await crawler.close()
+        await inference_executor.stop()
+        await training_writer.stop()
+        shared_s3.close()
+        crawl_cache.close()
+        password_pool.shutdown()
+        await close_db()
+        if not model_loader.done():
+            model_loader.cancel()
+        if model_watcher is not None:
+            model_watcher.cancel()
 
 app = FastAPI(
     title="Contact Extractor & Website Summary API",
@@ -218,9 +357,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
-    expose_headers=["X-Redirect-To"],  # Expose redirect header to frontend
+    expose_headers=["X-Redirect-To", "X-Next-Cursor"],  # Expose redirect and pagination headers to frontend
 )
 
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    response = await call_next(request)
+    if startup_timings["first_request_ms"] is None:
+        startup_timings["first_request_ms"] = _elapsed_ms()
+        print(f"Cold start: first request served after {startup_timings['first_request_ms']}ms")
+    return response
+
 # Global exception handler for authentication errors
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -250,8 +397,45 @@ async def health_check():
         "version": "2.1.0"
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Public readiness check - returns 503 until the lead scorer models are loaded.
+    """
+    model_status = registry.status()
+    content = {
+        "status": "ready" if registry.ready else model_status["status"],
+        "models": model_status,
+        "startup": startup_timings,
+    }
+    return JSONResponse(status_code=200 if registry.ready else 503, content=content)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Public runtime counters for caches and executors - no authentication required.
+    """
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "inference": inference_executor.stats(),
+        "page_store": page_store.stats(),
+        "crawl_cache": crawl_cache.stats(),
+        "crawl_scheduler": crawl_scheduler.stats(),
+        "extraction_jobs": job_queue.stats(),
+        "training_writer": training_writer.stats(),
+        "s3": shared_s3.metrics.stats(),
+        "models": registry.stats(),
+        "db_pool": pool_stats(),
+        "auth_cache": auth_cache.stats(),
+        "password_hashing": password_pool.stats(),
+        "login_rate_limit": login_limiter.stats(),
+        "query_understanding": query_cache.stats(),
+        "exa_search": exa_cache.stats(),
+        "llm": llm_gateway.stats(),
+    }
+
 @app.get("/")
-async def root(request: Request, db: Session = Depends(get_db)):
+async def root(request: Request, db: AsyncSession = Depends(get_db)):
     """
     Root endpoint - checks if user is authenticated.
     Returns user info if authenticated, otherwise indicates redirect needed.
@@ -272,19 +456,7 @@ async def root(request: Request, db: Session = Depends(get_db)):
     token = auth_header.replace("Bearer ", "")
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return JSONResponse(
-                status_code=401,
-                content={
-                    "authenticated": False,
-                    "message": "Invalid token",
-                    "redirect_to": "/auth/login"
-                }
-            )
-        
-        user = db.query(User).filter(User.email == email).first()
+        user = await _user_for_token(db, token)
         if user is None:
             return JSONResponse(
                 status_code=401,
@@ -325,15 +497,16 @@ async def root(request: Request, db: Session = Depends(get_db)):
         )
 
 @app.post("/signup", response_model=Token)
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    _check_login_rate("signup", user.email)
+    db_user = await _user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(email=user.email, password_hash=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_user_cache(user.email)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -341,8 +514,9 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/signin", response_model=Token)
-async def signin(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def signin(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    _check_login_rate("signin", form_data.username)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=401,
@@ -355,122 +529,153 @@ async def signin(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-# --- API Endpoint ---
-@app.post("/extract", response_model=ContactExtractionResponse)
-async def extract(request: QueryRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def _primary_contact_info(contacts: List[ContactInfo]) -> dict:
+    """Contact features for the scorer, taken from the first (best) contact."""
+    if not contacts:
+        return {}
+    contact = contacts[0]
+    return {
+        "email": contact.email,
+        "phone": contact.phone,
+        "contact_title": contact.designation
+    }
+
+async def _find_query(db: AsyncSession, user_id: int, query_text: str) -> Optional[Query]:
+    # The md5 predicate matches the ix_queries_user_text_md5 expression index
+    return (await db.execute(
+        select(Query).where(
+            Query.user_id == user_id,
+            func.md5(Query.query_text) == func.md5(query_text),
+            Query.query_text == query_text,
+        ).limit(1)
+    )).scalar_one_or_none()
+
+async def _owned_query(db: AsyncSession, query_id: int, user_id: int) -> Optional[Query]:
+    return (await db.execute(select(Query).where(Query.id == query_id, Query.user_id == user_id))).scalar_one_or_none()
+
+async def _owned_response(db: AsyncSession, response_id: int):
+    """(Response, Query) row for a response id, or None. Callers check Query.user_id."""
+    return (await db.execute(
+        select(Response, Query).join(Query, Response.query_id == Query.id).where(Response.id == response_id)
+    )).first()
+
+async def _stored_results(db: AsyncSession, query_id: int, limit: Optional[int] = None, after_id: Optional[int] = None, compact: bool = False) -> Dict[str, PerSourceResult]:
     """
-    Accepts a text query. Generates 5 search queries with Gemini, fetches top 10 links
-    per query via Google, de-duplicates, and runs the extraction pipeline on the
-    discovered links.
+    Stored per-source results of a query in insertion order. compact leaves out
+    the contacts and socials JSON columns (they are not even read from the DB).
     """
-    errors: Dict[str, str] = {}
-    user_query = request.query
+    if compact:
+        stmt = select(Response.id, Response.base_url, Response.summary, Response.fit_score)
+    else:
+        stmt = select(Response.id, Response.base_url, Response.summary, Response.fit_score, Response.contacts, Response.socials)
+    stmt = stmt.where(Response.query_id == query_id)
+    if after_id is not None:
+        stmt = stmt.where(Response.id > after_id)
+    stmt = stmt.order_by(Response.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    contacts_found = {}
+    for r in (await db.execute(stmt)).all():
+        contacts_found[r.base_url] = PerSourceResult(
+            socials=[] if compact else (r.socials or []),
+            summary=r.summary or "",
+            contacts=[] if compact else (r.contacts or []),
+            fit_score=r.fit_score or 0.0,
+            response_id=r.id
+        )
+    return contacts_found
 
-    # Check if query already exists for the user
-    existing_query = db.query(Query).filter(Query.user_id == current_user.id, Query.query_text == user_query).first()
-    if existing_query:
-        # Return existing responses
-        responses = db.query(Response).filter(Response.query_id == existing_query.id).all()
-        contacts_found = {}
-        for r in responses:
-            contacts_found[r.base_url] = PerSourceResult(
-                socials=r.socials or [],
-                summary=r.summary or "",
-                contacts=r.contacts or [],
-                fit_score=r.fit_score or 0.0,
-                response_id=r.id
-            )
-        return ContactExtractionResponse(contacts_found=contacts_found, errors={})
+def _encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode("utf-8")).decode("ascii").rstrip("=")
 
+def _decode_cursor(cursor: str) -> list:
     try:
-        base_inputs, website_summaries = await search_with_exa(user_query)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to search with exa: {str(e)}")
-    if not base_inputs:
-        raise HTTPException(status_code=404, detail="No search results found to process")
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _source_errors(base_url: str, errors: Dict[str, str]) -> Optional[Dict[str, str]]:
+    """The subset of a run's errors about base_url or pages on its host."""
+    host = urlparse(base_url).netloc
+    own = {key: value for key, value in errors.items() if key == base_url or (host and urlparse(key).netloc == host)}
+    return own or None
+
+async def _store_results(db: AsyncSession, user_id: int, user_query: str, contacts_found: Dict[str, PerSourceResult], errors: Dict[str, str]) -> int:
+    """
+    Store the query and its per-source responses in one transaction (setting
+    response_id on each result), then append the ML training records.
+    Returns the query id.
+    """
+    query_id = (await db.execute(
+        insert(Query).values(user_id=user_id, query_text=user_query, errors=errors or None).returning(Query.id)
+    )).scalar_one()
+    if contacts_found:
+        rows = [
+            {
+                "query_id": query_id,
+                "base_url": base_url,
+                "socials": result.socials,
+                "summary": result.summary,
+                "contacts": [contact.dict() for contact in result.contacts],
+                "fit_score": result.fit_score,
+                "errors": _source_errors(base_url, errors),
+            }
+            for base_url, result in contacts_found.items()
+        ]
+        # One multi-row INSERT ... RETURNING instead of a flush per response
+        inserted = await db.execute(insert(Response).values(rows).returning(Response.id, Response.base_url))
+        for response_id, base_url in inserted.all():
+            contacts_found[base_url].response_id = response_id
+    await db.commit()
+
+    # Queue ML training records for the background S3 writer (if configured)
+    try:
+        training_writer.enqueue(_build_ml_jsonl_records(user_query, contacts_found))
+    except Exception:
+        # Fail-soft: don't block API on data logging issues
+        pass
+    return query_id
+
+async def _crawl_contacts(base_urls: List[str], errors: Dict[str, str]) -> tuple[Dict[str, List[ContactInfo]], Dict[str, List[str]]]:
+    """
+    Crawl pipeline for a set of base URLs: footer links, regex pre-filter, LLM
+    extraction and per-source dedupe. Errors are recorded into errors.
+    Returns (contacts per base URL, social links per base URL).
+    """
+    if not base_urls:
+        return {}, {}
 
     # === STEP 1: Find all "important" internal links from the footers ===
-    important_links_map, social_links_map, link_errors = await get_important_internal_links(base_inputs)
+    important_links_map, social_links_map, link_errors = await get_important_internal_links(base_urls)
     errors.update(link_errors)
     all_important_urls = list(set(url for url_list in important_links_map.values() for url in url_list))
-    
     if not all_important_urls:
-        # Return just socials (if any) in the new structure
-        contacts_found: Dict[str, PerSourceResult] = {}
-        for base in base_inputs:
-            fit_score = predict_fit_score(user_query, {"org_summary": website_summaries.get(base, ""), "contact_info": {}})
-            contacts_found[base] = PerSourceResult(
-                socials=social_links_map.get(base, []),
-                summary=website_summaries.get(base, ""),
-                contacts=[],
-                fit_score=fit_score
-            )
-        # Trim empty sources
-        contacts_found = {k: v for k, v in contacts_found.items() if (v.socials or v.contacts or v.summary)}
-        return ContactExtractionResponse(contacts_found=contacts_found, errors=errors)
-
-    # === STEP 2: Pre-filtering with Regex ===
-    regex_config = CrawlerRunConfig(
-        extraction_strategy=RegexExtractionStrategy(
-            pattern=RegexExtractionStrategy.Email | RegexExtractionStrategy.PhoneUS
-        ),
-        stream=True
-    )
-    urls_with_contacts = set()
-    async for result in await crawler.arun_many(all_important_urls, config=regex_config):
-        if result.success and result.extracted_content and json.loads(result.extracted_content):
-            urls_with_contacts.add(result.url)
+        return {}, social_links_map
 
+    # === STEP 2: Pre-filtering with Regex (matching pages are kept in the page store) ===
+    urls_with_contacts = await find_pages_with_contacts(all_important_urls)
     if not urls_with_contacts:
         errors["summary"] = "Found important pages, but none contained email or phone patterns."
-        # Return summaries even if no contacts found
-        contacts_found: Dict[str, PerSourceResult] = {}
-        for base in base_inputs:
-            fit_score = predict_fit_score(user_query, {"org_summary": website_summaries.get(base, ""), "contact_info": {}})
-            contacts_found[base] = PerSourceResult(
-                socials=social_links_map.get(base, []),
-                summary=website_summaries.get(base, ""),
-                contacts=[],
-                fit_score=fit_score
-            )
-        # Trim empty sources
-        contacts_found = {k: v for k, v in contacts_found.items() if (v.socials or v.contacts or v.summary)}
-        return ContactExtractionResponse(contacts_found=contacts_found, errors=errors)
-        
-    # === STEP 3: Structured Extraction with LLM ===
-    llm_provider_config = LLMConfig(
-        provider="gemini/gemini-2.0-flash",
-        api_token="env:GEMINI_API_KEY",
-    )
-    
-    llm_strategy = LLMExtractionStrategy(
-        llm_config=llm_provider_config,
-        schema=ContactInfo.model_json_schema(),
-        instruction="Extract all contact information details from the text. For each person, provide their name, designation, email, and phone number. Do not include duplicate contacts. If two records share the same email or phone number, keep only the one that contains more information (name or designation) and discard the less informative one. Ensure the final output has only unique and most complete records.",
-        input_format="fit_markdown"
-    )
-    
-    llm_crawl_config = CrawlerRunConfig(
-        extraction_strategy=llm_strategy,
-        stream=True 
-    )
-    
-    final_contacts: Dict[str, List[ContactInfo]] = {url: [] for url in base_inputs}
+        return {}, social_links_map
+
+    # === STEP 3: Structured Extraction with LLM on the stored pages ===
+    final_contacts: Dict[str, List[ContactInfo]] = {url: [] for url in base_urls}
     
-    async for result in await crawler.arun_many(list(urls_with_contacts), config=llm_crawl_config):
-        if result.success and result.extracted_content:
-            try:
-                base_url = next(b for b in base_inputs if urlparse(b).netloc in result.url)
-                extracted_data = json.loads(result.extracted_content)
-                
-                if isinstance(extracted_data, list):
-                    for item in extracted_data:
-                        final_contacts[base_url].append(ContactInfo(**item))
-                elif isinstance(extracted_data, dict):
-                    final_contacts[base_url].append(ContactInfo(**extracted_data))
-
-            except (json.JSONDecodeError, StopIteration, TypeError) as e:
-                errors[result.url] = f"LLM result parsing error: {str(e)}"
+    for page_url, extracted_data, error in await extract_contacts_from_pages(urls_with_contacts, extract_contacts_with_llm):
+        if error:
+            errors[page_url] = error
+            continue
+        try:
+            base_url = next(b for b in base_urls if urlparse(b).netloc in page_url)
+            
+            if isinstance(extracted_data, list):
+                for item in extracted_data:
+                    final_contacts[base_url].append(ContactInfo(**item))
+            elif isinstance(extracted_data, dict):
+                final_contacts[base_url].append(ContactInfo(**extracted_data))
+
+        except (StopIteration, TypeError, ValueError) as e:
+            errors[page_url] = f"LLM result parsing error: {str(e)}"
 
     final_contacts = {k: v for k, v in final_contacts.items() if v}
     
@@ -495,106 +700,396 @@ async def extract(request: QueryRequest, current_user: User = Depends(get_curren
             unique_list.append(contact)
         final_contacts[base_url] = unique_list
 
+    return final_contacts, social_links_map
+
+async def _load_fresh_company_profiles(db: AsyncSession, base_urls: List[str]) -> Dict[str, CompanyProfile]:
+    """
+    Company profiles for base URLs whose domain was crawled recently enough to
+    skip the crawl and the LLM. Profiles without contacts expire sooner, since
+    an empty result is more often a transient crawl failure.
+    """
+    domains = {company_domain(base): base for base in base_urls}
+    now = datetime.utcnow()
+    fresh: Dict[str, CompanyProfile] = {}
+    for profile in (await db.execute(select(CompanyProfile).where(CompanyProfile.domain.in_(list(domains))))).scalars():
+        max_age = COMPANY_PROFILE_MAX_AGE if profile.contacts else COMPANY_PROFILE_EMPTY_MAX_AGE
+        if profile.last_crawled_at and now - profile.last_crawled_at <= max_age:
+            fresh[domains[profile.domain]] = profile
+    return fresh
+
+async def _save_company_profiles(db: AsyncSession, base_urls: List[str], final_contacts: Dict[str, List[ContactInfo]], social_links_map: Dict[str, List[str]], website_summaries: Dict[str, str], errors: Dict[str, str]):
+    """
+    Upsert the per-domain company profile for every base URL that was crawled.
+    Base URLs whose footer crawl failed are skipped so the next run retries them.
+    """
+    crawled = {company_domain(base): base for base in base_urls if base not in errors}
+    if not crawled:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "domain": domain,
+            "base_url": base,
+            "contacts": [contact.dict() for contact in final_contacts.get(base, [])],
+            "socials": social_links_map.get(base, []),
+            "summary": website_summaries.get(base, ""),
+            "last_crawled_at": now,
+        }
+        for domain, base in crawled.items()
+    ]
+    # ON CONFLICT instead of read-then-write: concurrent requests for the same
+    # domain just overwrite each other with equally fresh profiles
+    stmt = pg_insert(CompanyProfile).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CompanyProfile.domain],
+        set_={column: stmt.excluded[column] for column in ("base_url", "contacts", "socials", "summary", "last_crawled_at")},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+# --- API Endpoint ---
+@app.post("/extract", response_model=ContactExtractionResponse)
+async def extract(request: QueryRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    Accepts a text query. Generates 5 search queries with Gemini, fetches top 10 links
+    per query via Google, de-duplicates, and runs the extraction pipeline on the
+    discovered links.
+    """
+    errors: Dict[str, str] = {}
+    user_query = request.query
+
+    # Check if query already exists for the user
+    existing_query = await _find_query(db, current_user.id, user_query)
+    if existing_query:
+        # Return existing responses
+        return ContactExtractionResponse(contacts_found=await _stored_results(db, existing_query.id), errors={})
+
+    try:
+        base_inputs, website_summaries = await search_with_exa(user_query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search with exa: {str(e)}")
+    if not base_inputs:
+        raise HTTPException(status_code=404, detail="No search results found to process")
+
+    # === STEP 0: Reuse fresh per-domain company profiles instead of re-crawling ===
+    profiles = await _load_fresh_company_profiles(db, base_inputs)
+    crawl_bases = [base for base in base_inputs if base not in profiles]
+
+    final_contacts, social_links_map = await _crawl_contacts(crawl_bases, errors)
+    await _save_company_profiles(db, crawl_bases, final_contacts, social_links_map, website_summaries, errors)
+    for base, profile in profiles.items():
+        final_contacts[base] = [ContactInfo(**c) for c in (profile.contacts or [])]
+        social_links_map[base] = profile.socials or []
+
     # Build final response with socials, summaries, and contacts
+    contact_infos = {base: _primary_contact_info(final_contacts.get(base, [])) for base in base_inputs}
+    fit_scores = await _score_sources(user_query, base_inputs, website_summaries, contact_infos)
     contacts_found: Dict[str, PerSourceResult] = {}
     for base in base_inputs:
-        contacts = final_contacts.get(base, [])
-        if contacts:
-            contact = contacts[0]
-            contact_info = {
-                "email": contact.email,
-                "phone": contact.phone,
-                "contact_title": contact.designation
-            }
-        else:
-            contact_info = {}
-        fit_score = predict_fit_score(user_query, {"org_summary": website_summaries.get(base, ""), "contact_info": contact_info})
         contacts_found[base] = PerSourceResult(
             socials=social_links_map.get(base, []),
             summary=website_summaries.get(base, ""),
-            contacts=contacts,
-            fit_score=fit_score
+            contacts=final_contacts.get(base, []),
+            fit_score=fit_scores[base]
         )
     # Remove entries that have neither socials, contacts, nor summaries
     contacts_found = {k: v for k, v in contacts_found.items() if (v.socials or v.contacts or v.summary)}
 
-    # Store query and responses in DB
-    db_query = Query(user_id=current_user.id, query_text=user_query)
-    db.add(db_query)
-    db.commit()
-    db.refresh(db_query)
-    for base_url, result in contacts_found.items():
-        db_response = Response(
-            query_id=db_query.id,
-            base_url=base_url,
-            socials=result.socials,
-            summary=result.summary,
-            contacts=[contact.dict() for contact in result.contacts],
-            fit_score=result.fit_score,
-            errors=errors  # Store global errors; can refine later
-        )
-        db.add(db_response)
-        db.flush()  # Assign ID
-        result.response_id = db_response.id
-    db.commit()
+    await _store_results(db, current_user.id, user_query, contacts_found, errors)
+    return ContactExtractionResponse(contacts_found=contacts_found, errors=errors)
+
+def _ndjson_event(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, default=str) + "\n"
 
-    # Append ML training records to S3 JSONL (if configured)
+async def _extraction_events(user_id: int, user_query: str):
+    """
+    Per-source variant of the /extract pipeline. Every base URL runs its own
+    crawl -> LLM -> score chain, and its result is yielded as an event dict the
+    moment it completes; results are persisted and summarized at the end.
+    Consumed by /extract/stream and by the extraction job workers.
+    """
+    started = time.perf_counter()
+    errors: Dict[str, str] = {}
+    db = AsyncSessionLocal()
+    tasks: List[asyncio.Task] = []
     try:
-        ml_records = _build_ml_jsonl_records(user_query, contacts_found)
-        _append_jsonl_records_to_s3(ml_records)
-    except Exception:
-        # Fail-soft: don't block API on data logging issues
-        pass
+        existing_query = await _find_query(db, user_id, user_query)
+        if existing_query:
+            stored = await _stored_results(db, existing_query.id)
+            yield {"type": "sources", "base_urls": list(stored)}
+            for base_url, result in stored.items():
+                yield {"type": "source", "base_url": base_url, "result": result.dict()}
+            yield {
+                "type": "summary",
+                "query_id": existing_query.id,
+                "response_ids": {b: r.response_id for b, r in stored.items()},
+                "errors": {},
+                "cached": True,
+            }
+            return
 
-    return ContactExtractionResponse(contacts_found=contacts_found, errors=errors)
+        try:
+            base_inputs, website_summaries = await search_with_exa(user_query)
+        except Exception as e:
+            yield {"type": "error", "status_code": 500, "detail": f"Failed to search with exa: {str(e)}"}
+            return
+        if not base_inputs:
+            yield {"type": "error", "status_code": 404, "detail": "No search results found to process"}
+            return
+
+        yield {"type": "sources", "base_urls": base_inputs}
+
+        profiles = await _load_fresh_company_profiles(db, base_inputs)
+        crawled_contacts: Dict[str, List[ContactInfo]] = {}
+        crawled_socials: Dict[str, List[str]] = {}
+
+        async def process_source(base: str) -> tuple[str, PerSourceResult]:
+            if base in profiles:
+                contacts = [ContactInfo(**c) for c in (profiles[base].contacts or [])]
+                socials = profiles[base].socials or []
+            else:
+                try:
+                    contacts_map, socials_map = await _crawl_contacts([base], errors)
+                except Exception as e:
+                    errors[base] = f"Extraction failed: {str(e)}"
+                    contacts_map, socials_map = {}, {}
+                contacts = crawled_contacts[base] = contacts_map.get(base, [])
+                socials = crawled_socials[base] = socials_map.get(base, [])
+            summary = website_summaries.get(base, "")
+            try:
+                fit_score = (await inference_executor.score(user_query, [{"org_summary": summary, "contact_info": _primary_contact_info(contacts)}]))[0]
+            except Exception as e:
+                errors[base] = f"Scoring failed: {str(e)}"
+                fit_score = None
+            return base, PerSourceResult(socials=socials, summary=summary, contacts=contacts, fit_score=fit_score)
+
+        contacts_found: Dict[str, PerSourceResult] = {}
+        first_result_ms = None
+        tasks = [asyncio.create_task(process_source(base)) for base in base_inputs]
+        for next_result in asyncio.as_completed(tasks):
+            base, result = await next_result
+            if not (result.socials or result.contacts or result.summary):
+                yield {"type": "source_empty", "base_url": base}
+                continue
+            contacts_found[base] = result
+            if first_result_ms is None:
+                first_result_ms = round((time.perf_counter() - started) * 1000, 1)
+            yield {"type": "source", "base_url": base, "result": result.dict()}
+
+        crawl_bases = [base for base in base_inputs if base not in profiles]
+        await _save_company_profiles(db, crawl_bases, crawled_contacts, crawled_socials, website_summaries, errors)
+        query_id = await _store_results(db, user_id, user_query, contacts_found, errors)
+        yield {
+            "type": "summary",
+            "query_id": query_id,
+            "response_ids": {b: r.response_id for b, r in contacts_found.items()},
+            "errors": errors,
+            "cached": False,
+            "first_result_ms": first_result_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await db.close()
+
+async def _ndjson_stream(user_id: int, user_query: str):
+    async for event in _extraction_events(user_id, user_query):
+        yield _ndjson_event(event)
+
+@app.post("/extract/stream")
+async def extract_stream(request: QueryRequest, current_user: User = Depends(get_current_user)):
+    """
+    Streaming variant of /extract (NDJSON). Emits a {"type": "sources"} event with
+    the base URLs being processed, one {"type": "source"} event per base URL as
+    soon as its contacts are extracted and scored ({"type": "source_empty"} when
+    nothing was found for it), then a final {"type": "summary"}
+    event with the stored query id, response ids and errors.
+    Failures before any source is processed are sent as {"type": "error"}.
+    """
+    # The generator opens its own DB session: dependency sessions may be closed
+    # before a streaming body finishes.
+    return StreamingResponse(_ndjson_stream(current_user.id, request.query), media_type="application/x-ndjson")
+
+# Background extraction jobs, run by in-process workers over the same event pipeline
+job_queue = ExtractionJobQueue(
+    _extraction_events,
+    workers=int(os.getenv("EXTRACT_JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("EXTRACT_JOB_QUEUE_SIZE", "100")),
+    retention_seconds=int(os.getenv("EXTRACT_JOB_RETENTION_SECONDS", "3600")),
+)
+
+@app.post("/extract/jobs", response_model=ExtractionJobResponse, status_code=202)
+async def create_extraction_job(request: QueryRequest, current_user: User = Depends(get_current_user)):
+    """
+    Queue an extraction and return its job id immediately. If the same user
+    already has a queued or running job for the same query text, that job is
+    returned instead of starting a new one.
+    """
+    try:
+        job, deduplicated = job_queue.submit(current_user.id, request.query)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Extraction queue is full, try again later", headers={"Retry-After": "10"})
+    return ExtractionJobResponse(**job.to_dict(), deduplicated=deduplicated)
+
+@app.get("/extract/jobs/{job_id}", response_model=ExtractionJobResponse)
+async def get_extraction_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Job status, progress and the per-source results completed so far.
+    """
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ExtractionJobResponse(**job.to_dict())
 
 @app.get("/chat_history", response_model=List[ChatHistoryItem])
-async def get_chat_history(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    queries = db.query(Query).filter(Query.user_id == current_user.id).order_by(Query.created_at.desc()).all()
-    return [ChatHistoryItem(id=q.id, query_text=q.query_text, created_at=q.created_at) for q in queries]
+async def get_chat_history(
+    http_response: HTTPResponse,
+    limit: Optional[int] = QueryParam(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The user's queries, newest first, one page at a time (keyset pagination).
+    When more rows exist the X-Next-Cursor header holds the cursor for the next page.
+    Without limit or cursor every query is returned, as older clients expect.
+    """
+    stmt = select(Query.id, Query.query_text, Query.created_at).where(Query.user_id == current_user.id)
+    if cursor:
+        try:
+            created_at, last_id = _decode_cursor(cursor)
+            created_at = datetime.fromisoformat(created_at)
+            last_id = int(last_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(Query.created_at, Query.id) < tuple_(created_at, last_id))
+    if limit is None and cursor:
+        limit = 50
+    stmt = stmt.order_by(Query.created_at.desc(), Query.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        http_response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1].created_at.isoformat(), rows[-1].id)
+    return [ChatHistoryItem(id=q.id, query_text=q.query_text, created_at=q.created_at) for q in rows]
 
 @app.get("/query/{query_id}/responses", response_model=ContactExtractionResponse)
-async def get_query_responses(query_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    query = db.query(Query).filter(Query.id == query_id, Query.user_id == current_user.id).first()
+async def get_query_responses(
+    query_id: int,
+    http_response: HTTPResponse,
+    limit: Optional[int] = QueryParam(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    view: Literal["full", "compact"] = "full",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stored results of a query, one page at a time (X-Next-Cursor as in /chat_history).
+    view=compact returns only summary and fit score per source; fetch the
+    contacts and socials of a single source with /responses/{response_id}.
+    Without limit or cursor every result is returned, as older clients expect.
+    """
+    query = await _owned_query(db, query_id, current_user.id)
     if not query:
         raise HTTPException(status_code=404, detail="Query not found")
-    responses = db.query(Response).filter(Response.query_id == query_id).all()
-    contacts_found = {}
-    errors = {}
-    for r in responses:
-        contacts_found[r.base_url] = PerSourceResult(
-            socials=r.socials or [],
-            summary=r.summary or "",
-            contacts=r.contacts or [],
-            fit_score=r.fit_score or 0.0,
-            response_id=r.id
-        )
-    return ContactExtractionResponse(contacts_found=contacts_found, errors=errors)
+    after_id = None
+    if cursor:
+        try:
+            (after_id,) = _decode_cursor(cursor)
+            after_id = int(after_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    if limit is None and cursor:
+        limit = 100
+    contacts_found = await _stored_results(db, query_id, limit=None if limit is None else limit + 1, after_id=after_id, compact=view == "compact")
+    if limit is not None and len(contacts_found) > limit:
+        contacts_found = dict(list(contacts_found.items())[:limit])
+        last = list(contacts_found.values())[-1]
+        http_response.headers["X-Next-Cursor"] = _encode_cursor(last.response_id)
+    return ContactExtractionResponse(contacts_found=contacts_found, errors=query.errors or {})
+
+@app.get("/responses/{response_id}", response_model=PerSourceResult)
+async def get_response(response_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """
+    One stored source result with its contacts and socials.
+    """
+    row = await _owned_response(db, response_id)
+    if not row or row[1].user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Response not found")
+    response = row[0]
+    return PerSourceResult(
+        socials=response.socials or [],
+        summary=response.summary or "",
+        contacts=response.contacts or [],
+        fit_score=response.fit_score or 0.0,
+        response_id=response.id,
+    )
 
 @app.post("/score")
 async def score_lead(request: LeadRequest, current_user: User = Depends(get_current_user)):
     """
     Score a lead based on query, organization summary, and contact info.
     """
-    fit_score = predict_fit_score(request.query, {"org_summary": request.org_summary, "contact_info": request.contact_info})
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail="Lead scorer is still loading", headers={"Retry-After": "5"})
+    fit_score = (await inference_executor.score(request.query, [{"org_summary": request.org_summary, "contact_info": request.contact_info}]))[0]
     return {"fit_score": fit_score}
 
+@app.get("/models")
+async def list_models(admin: User = Depends(get_model_admin)):
+    """
+    Saved model versions, the active and shadow versions, and per-version scoring stats.
+    """
+    return {"versions": list_versions(registry.model_dir), **registry.stats()}
+
+@app.post("/models/activate")
+async def activate_model(request: ModelVersionRequest, admin: User = Depends(get_model_admin)):
+    """
+    Make a version current. In-flight scoring finishes on the previous version;
+    other workers pick the change up on their next reload poll.
+    """
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail="Lead scorer is still loading", headers={"Retry-After": "5"})
+    if not request.version:
+        raise HTTPException(status_code=400, detail="version is required")
+    try:
+        await asyncio.to_thread(registry.activate, request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return registry.status()
+
+@app.post("/models/shadow")
+async def shadow_model(request: ModelVersionRequest, admin: User = Depends(get_model_admin)):
+    """
+    Score live traffic with a candidate version in the background (version null stops it).
+    """
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail="Lead scorer is still loading", headers={"Retry-After": "5"})
+    try:
+        await asyncio.to_thread(registry.set_shadow, request.version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return registry.status()
+
 @app.post("/feedback/{response_id}")
-async def add_feedback(response_id: int, feedback: FeedbackRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def add_feedback(response_id: int, feedback: FeedbackRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """
     Add user feedback to a response for training data.
     """
-    response = db.query(Response).filter(Response.id == response_id).first()
-    if not response:
+    row = await _owned_response(db, response_id)
+    if not row:
         raise HTTPException(status_code=404, detail="Response not found")
-    if response.query.user_id != current_user.id:
+    response, query = row
+    if query.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     response.user_feedback = feedback.feedback
-    db.commit()
-    # Append feedback-enriched record to S3 JSONL
+    await db.commit()
+    # Queue feedback-enriched record for the background S3 writer
     try:
         # Rebuild a single record from this response with user_feedback
-        query = response.query
         # Choose first contact, map designation to contact_title
         first_contact = None
         if isinstance(response.contacts, list) and response.contacts:
@@ -609,19 +1104,20 @@ async def add_feedback(response_id: int, feedback: FeedbackRequest, current_user
             "org_summary": response.summary or "",
             "contact_info": contact_info,
             "user_feedback": feedback.feedback or "",
+            "logged_at": datetime.utcnow().isoformat(),
         }
-        _append_jsonl_records_to_s3([record])
+        training_writer.enqueue([record])
     except Exception:
         # Fail-soft
         pass
     return {"message": "Feedback added successfully"}
 
 @app.post("/generate_email", response_model=EmailResponse)
-async def generate_email_endpoint(request: EmailGenerateRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def generate_email_endpoint(request: EmailGenerateRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     """
     Generate email content using Gemini.
     """
-    query = db.query(Query).filter(Query.id == request.query_id, Query.user_id == current_user.id).first()
+    query = await _owned_query(db, request.query_id, current_user.id)
     if not query:
         raise HTTPException(status_code=404, detail="Query not found")
     email_data = await generate_email_content(query.query_text, request.summary)
@@ -0,0 +1,83 @@
+"""
+Requests-per-second benchmark for authenticated endpoints.
+
+Start the API twice, once with the auth cache disabled and once with it on,
+and run this script against each:
+
+    AUTH_CACHE_TTL_SECONDS=0 uvicorn app:app --port 8000 &   # before
+    python bench_auth_cache.py --email bench@example.com --password secret
+
+    uvicorn app:app --port 8000 &                            # after (cache on)
+    python bench_auth_cache.py --email bench@example.com --password secret
+
+The account is created on first use. The default target is /chat_history?limit=1,
+whose own query is a single index lookup, so the users-table round-trip the
+cache removes is a large share of each request.
+"""
+import time
+import asyncio
+import argparse
+from typing import List
+
+import httpx
+
+
+async def get_token(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/signin", data={"username": email, "password": password})
+    if response.status_code == 401:
+        response = await client.post("/signup", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client: httpx.AsyncClient, path: str, headers: dict, deadline: float, latencies: List[float], errors: List[int]):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else 0.0
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        token = args.token or await get_token(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        # Warm-up: fills the auth cache and the DB pool
+        await asyncio.gather(*(client.get(args.path, headers=headers) for _ in range(args.concurrency)))
+
+        latencies: List[float] = []
+        errors: List[int] = []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(client, args.path, headers, deadline, latencies, errors) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        print(f"Target: {args.url}{args.path}  concurrency={args.concurrency}  duration={elapsed:.1f}s")
+        print(f"Requests: {len(latencies)}  errors: {len(errors)}  rps: {len(latencies) / elapsed:.1f}")
+        print(f"Latency ms: p50={percentile(latencies, 0.50):.1f}  p95={percentile(latencies, 0.95):.1f}  p99={percentile(latencies, 0.99):.1f}")
+        metrics = (await client.get("/metrics")).json()
+        print(f"Auth cache: {metrics.get('auth_cache')}")
+        print(f"DB pool: {metrics.get('db_pool')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark authenticated requests per second against a running API.")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--path", default="/chat_history?limit=1", help="Authenticated endpoint to hit")
+    parser.add_argument("--email", default="bench@example.com")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--token", default=None, help="Use this bearer token instead of signing in")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds to run")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
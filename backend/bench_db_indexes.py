@@ -0,0 +1,121 @@
+"""
+Seed a large synthetic history in a scratch schema and show the query plans
+for the history, dedupe, responses and feedback lookups, without and then
+with the indexes from migrations.py.
+
+    python bench_db_indexes.py --users 200 --queries-per-user 500 --responses-per-query 10
+
+Runs against the database configured in db.py, inside its own schema
+(default bench_outreach), which is dropped afterwards unless --keep is given.
+"""
+import time
+import argparse
+from typing import Dict, List
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+from db import engine, Base, Query, Response
+from migrations import MIGRATIONS, apply_migrations
+
+INDEX_NAMES = ["ix_queries_user_created", "ix_queries_user_text_md5", "ix_responses_query_id"]
+
+
+def seed(conn, users: int, queries_per_user: int, responses_per_query: int):
+    conn.execute(text(
+        "INSERT INTO users (email, password_hash, is_active, created_at) "
+        "SELECT 'bench' || g || '@example.com', 'x', true, now() FROM generate_series(1, :n) g"
+    ), {"n": users})
+    conn.execute(text(
+        "INSERT INTO queries (user_id, query_text, created_at) "
+        "SELECT u.id, 'find suppliers ' || u.id || '-' || g || ' ' || md5(random()::text), "
+        "now() - (g || ' minutes')::interval FROM users u, generate_series(1, :n) g"
+    ), {"n": queries_per_user})
+    conn.execute(text(
+        "INSERT INTO responses (query_id, base_url, summary, contacts, socials, fit_score, errors, created_at) "
+        "SELECT q.id, 'https://company' || g || '.example.com', repeat('summary text ', 20), "
+        "'[{\"email\": \"sales@example.com\", \"phone\": null, \"name\": null, \"designation\": null}]'::json, "
+        "'[]'::json, random() * 100, '{}'::json, q.created_at "
+        "FROM queries q, generate_series(1, :n) g"
+    ), {"n": responses_per_query})
+    conn.execute(text("ANALYZE"))
+
+
+def lookups(conn) -> Dict[str, object]:
+    """The statements the API issues, bound to a user and query from the middle of the data."""
+    user_id, query_id, query_text = conn.execute(text(
+        "SELECT user_id, id, query_text FROM queries ORDER BY id OFFSET (SELECT count(*) / 2 FROM queries) LIMIT 1"
+    )).one()
+    response_id = conn.execute(select(Response.id).where(Response.query_id == query_id).limit(1)).scalar_one()
+    return {
+        "chat_history": select(Query).where(Query.user_id == user_id).order_by(Query.created_at.desc()),
+        "dedupe_lookup": select(Query).where(
+            Query.user_id == user_id,
+            func.md5(Query.query_text) == func.md5(query_text),
+            Query.query_text == query_text,
+        ).limit(1),
+        "query_responses": select(Response).where(Response.query_id == query_id),
+        "feedback_lookup": select(Response, Query).join(Query, Response.query_id == Query.id).where(Response.id == response_id),
+    }
+
+
+def explain(conn, statements: Dict[str, object], show_plans: bool) -> Dict[str, float]:
+    timings = {}
+    for name, stmt in statements.items():
+        sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        plan: List[str] = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {sql}").scalars().all()
+        execution = next((line for line in plan if line.startswith("Execution Time")), "")
+        timings[name] = float(execution.split(":")[1].strip().split()[0]) if execution else float("nan")
+        if show_plans:
+            print(f"\n--- {name} ---")
+            print("\n".join(plan))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history/dedupe/feedback lookups with and without indexes.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--queries-per-user", type=int, default=500)
+    parser.add_argument("--responses-per-query", type=int, default=10)
+    parser.add_argument("--schema", default="bench_outreach", help="Scratch schema to seed (dropped afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    parser.add_argument("--quiet", action="store_true", help="Only print timings, not full plans")
+    args = parser.parse_args()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE')
+        conn.exec_driver_sql(f'CREATE SCHEMA "{args.schema}"')
+        conn.exec_driver_sql(f'SET search_path TO "{args.schema}"')
+        try:
+            Base.metadata.create_all(conn)
+            # Start from the pre-migration schema: primary keys and users.email only
+            for name in INDEX_NAMES:
+                conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+            started = time.perf_counter()
+            seed(conn, args.users, args.queries_per_user, args.responses_per_query)
+            counts = {t: conn.exec_driver_sql(f"SELECT count(*) FROM {t}").scalar() for t in ("users", "queries", "responses")}
+            print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+            statements = lookups(conn)
+
+            print("\n=== Without indexes ===")
+            before = explain(conn, statements, not args.quiet)
+
+            started = time.perf_counter()
+            apply_migrations(conn)
+            conn.execute(text("ANALYZE"))
+            print(f"\nApplied {', '.join(v for v, _ in MIGRATIONS)} in {time.perf_counter() - started:.1f}s")
+
+            print("\n=== With indexes ===")
+            after = explain(conn, statements, not args.quiet)
+
+            print(f"\n{'lookup':<18} {'before ms':>10} {'after ms':>10}")
+            for name in statements:
+                print(f"{name:<18} {before[name]:>10.3f} {after[name]:>10.3f}")
+        finally:
+            if not args.keep:
+                conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{args.schema}" CASCADE')
+
+
+if __name__ == "__main__":
+    main()
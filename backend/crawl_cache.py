@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form used for cache keys: lowercase scheme and host, no default
+    port, no fragment, no trailing slash (except the root) and sorted query
+    parameters.
+    """
+    try:
+        parsed = urlparse(url.strip())
+    except (ValueError, AttributeError):
+        return url
+    scheme = parsed.scheme.lower()
+    netloc = parsed.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parsed.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, path, "", query, ""))
+
+
+class CrawlCache:
+    """
+    Crawl results shared across users and queries, stored in SQLite as
+    zlib-compressed JSON blobs.
+
+    Entries are keyed by (pipeline stage, normalized URL, crawl config key),
+    expire after ttl_seconds and are evicted least-recently-used once the
+    table holds more than max_entries rows. Hits and misses are counted per
+    stage so each pipeline step's hit rate can be reported.
+
+    Calls block on SQLite, so async code runs them with asyncio.to_thread.
+    Access times of hits are buffered and written in one batch at most every
+    touch_interval seconds (or on eviction and close), not on every hit.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 86400, max_entries: int = 20000, touch_interval: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.enabled = bool(path) and ttl_seconds > 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes_since_evict = 0
+        self._touched: Dict[str, float] = {}
+        self._last_touch_flush = time.time()
+        self._conn = None
+        if self.enabled:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Under WAL a crash can lose the last commits but not corrupt the file; fine for a cache
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawl_cache ("
+                " key TEXT PRIMARY KEY, stage TEXT NOT NULL, url TEXT NOT NULL,"
+                " payload BLOB NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_crawl_cache_accessed ON crawl_cache (accessed_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def _key(stage: str, url: str, config_key: str) -> str:
+        return hashlib.sha256(f"{stage}\x00{normalize_url(url)}\x00{config_key}".encode("utf-8")).hexdigest()
+
+    def _count(self, stage: str, outcome: str):
+        counters = self._stats.setdefault(stage, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, stage: str, url: str, config_key: str = "") -> Optional[dict]:
+        return self.get_many(stage, [url], config_key).get(url)
+
+    def get_many(self, stage: str, urls: List[str], config_key: str = "") -> Dict[str, dict]:
+        """Fresh cached values for urls, as {url: value}; misses are left out."""
+        if not self.enabled:
+            return {}
+        found: Dict[str, dict] = {}
+        now = time.time()
+        with self._lock:
+            expired = []
+            for url in urls:
+                key = self._key(stage, url, config_key)
+                row = self._conn.execute("SELECT payload, created_at FROM crawl_cache WHERE key = ?", (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl_seconds:
+                    if row is not None:
+                        expired.append((key,))
+                    self._count(stage, "misses")
+                    continue
+                self._touched[key] = now
+                self._count(stage, "hits")
+                found[url] = row[0]
+            if expired:
+                self._conn.executemany("DELETE FROM crawl_cache WHERE key = ?", expired)
+                self._conn.commit()
+            if now - self._last_touch_flush >= self.touch_interval:
+                self._flush_touched(now)
+                self._conn.commit()
+        return {url: json.loads(zlib.decompress(payload).decode("utf-8")) for url, payload in found.items()}
+
+    def _flush_touched(self, now: float):
+        self._last_touch_flush = now
+        if self._touched:
+            self._conn.executemany("UPDATE crawl_cache SET accessed_at = ? WHERE key = ?",
+                                   [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def put(self, stage: str, url: str, value: dict, config_key: str = ""):
+        if not self.enabled:
+            return
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        key = self._key(stage, url, config_key)
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_cache (key, stage, url, payload, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, normalize_url(url), payload, now, now),
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 100:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._writes_since_evict = 0
+        # LRU order needs the buffered access times
+        self._flush_touched(now)
+        self._conn.execute("DELETE FROM crawl_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM crawl_cache WHERE key IN ("
+            " SELECT key FROM crawl_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        stages = {}
+        for stage, counters in self._stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            stages[stage] = {**counters, "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0}
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM crawl_cache").fetchone()[0]
+        return {"enabled": self.enabled, "entries": entries, "ttl_seconds": self.ttl_seconds, "stages": stages}
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._flush_touched(time.time())
+                self._conn.commit()
+            self._conn.close()
+            self._conn = None
+            self.enabled = False
@@ -0,0 +1,261 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from urllib.parse import urlparse
+
+# HTTP statuses that mean the host wants us to slow down
+THROTTLE_STATUS_CODES = {429, 503}
+# How often idle host states (nothing queued or running, delay elapsed) are dropped
+HOST_PRUNE_INTERVAL_SECONDS = 30.0
+
+
+@dataclass
+class _CrawlJob:
+    url: str
+    config: Any
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class _HostState:
+    delay: float
+    active: int = 0
+    next_allowed: float = 0.0
+    pending: Deque[_CrawlJob] = field(default_factory=deque)
+
+
+@dataclass
+class FailedCrawl:
+    """Stand-in result for crawls that raised instead of returning a CrawlResult."""
+    url: str
+    error_message: str
+    success: bool = False
+    status_code: Optional[int] = None
+    extracted_content: Optional[str] = None
+    markdown: Optional[str] = None
+    links: Dict[str, list] = field(default_factory=dict)
+
+
+class CrawlScheduler:
+    """
+    Politeness scheduler in front of a single AsyncWebCrawler.
+
+    URLs are queued per host and dispatched round-robin across hosts, so one
+    slow or large domain cannot starve the others. Dispatch respects a global
+    concurrency cap, a per-host concurrency cap and a minimum delay between
+    requests to the same host. When a host answers 429/503 its delay is doubled
+    (up to max_host_delay) and the URL is retried; successful responses decay
+    the delay back toward min_host_delay.
+    """
+
+    def __init__(self, crawler, max_concurrency: int = 10, per_host_concurrency: int = 2,
+                 min_host_delay: float = 1.0, max_host_delay: float = 30.0, max_retries: int = 2):
+        self.crawler = crawler
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.min_host_delay = min_host_delay
+        self.max_host_delay = max_host_delay
+        self.max_retries = max_retries
+        self._hosts: Dict[str, _HostState] = {}
+        self._rotation: Deque[str] = deque()
+        self._active = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running = set()
+        self._last_prune = 0.0
+        # Metrics
+        self.dispatched = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+
+    @staticmethod
+    def _host(url: str) -> str:
+        try:
+            return (urlparse(url).hostname or url).lower()
+        except (ValueError, TypeError):
+            return url
+
+    def _ensure_started(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for task in list(self._running):
+            task.cancel()
+        for state in self._hosts.values():
+            for job in state.pending:
+                job.future.cancel()
+        self._hosts.clear()
+        self._rotation.clear()
+
+    def _enqueue(self, job: _CrawlJob):
+        host = self._host(job.url)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(delay=self.min_host_delay)
+        state.pending.append(job)
+        if host not in self._rotation:
+            self._rotation.append(host)
+        self._wakeup.set()
+
+    def submit(self, url: str, config) -> asyncio.Future:
+        self._ensure_started()
+        job = _CrawlJob(url=url, config=config, future=asyncio.get_running_loop().create_future())
+        self._enqueue(job)
+        return job.future
+
+    async def arun(self, url: str, config):
+        return await self.submit(url, config)
+
+    async def arun_many(self, urls: List[str], config) -> AsyncIterator[Any]:
+        """
+        Drop-in for crawler.arun_many(..., stream=True): yields results as they
+        complete. Crawls that raise are yielded as FailedCrawl results.
+        """
+        async def settle(url: str, future: asyncio.Future):
+            try:
+                return await future
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return FailedCrawl(url=url, error_message=str(e))
+
+        futures = [self.submit(url, config) for url in urls]
+        tasks = [asyncio.ensure_future(settle(url, f)) for url, f in zip(urls, futures)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _next_job(self, now: float):
+        """
+        Pick the next runnable job round-robin across hosts.
+        Returns (host, job, None) or (None, None, seconds until a host frees up).
+        """
+        wait: Optional[float] = None
+        for _ in range(len(self._rotation)):
+            host = self._rotation[0]
+            self._rotation.rotate(-1)
+            state = self._hosts[host]
+            while state.pending and state.pending[0].future.done():
+                state.pending.popleft()  # caller gave up on it
+            if not state.pending:
+                self._rotation.remove(host)
+                if state.active == 0 and state.next_allowed <= now:
+                    del self._hosts[host]
+                continue
+            if state.active >= self.per_host_concurrency:
+                continue
+            if state.next_allowed > now:
+                delay = state.next_allowed - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            return host, state.pending.popleft(), None
+        return None, None, wait
+
+    def _prune_idle_hosts(self, now: float):
+        """
+        Drop hosts that left the rotation while a crawl was still running or
+        their delay had not elapsed; _next_job only deletes hosts that are idle
+        when it last sees them.
+        """
+        self._last_prune = now
+        idle = [
+            host for host, state in self._hosts.items()
+            if state.active == 0 and not state.pending and state.next_allowed <= now and host not in self._rotation
+        ]
+        for host in idle:
+            del self._hosts[host]
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            wait = None
+            if loop.time() - self._last_prune >= HOST_PRUNE_INTERVAL_SECONDS:
+                self._prune_idle_hosts(loop.time())
+            while self._active < self.max_concurrency and self._rotation:
+                host, job, wait = self._next_job(loop.time())
+                if job is None:
+                    break
+                state = self._hosts[host]
+                state.active += 1
+                state.next_allowed = loop.time() + state.delay
+                self._active += 1
+                self.dispatched += 1
+                task = asyncio.create_task(self._crawl(host, job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _crawl(self, host: str, job: _CrawlJob):
+        state = self._hosts[host]
+        retry = False
+        try:
+            result = await self.crawler.arun(job.url, config=job.config)
+            if getattr(result, "status_code", None) in THROTTLE_STATUS_CODES:
+                self.throttled += 1
+                state.delay = min(max(state.delay * 2, 1.0), self.max_host_delay)
+                # next_allowed was set from the old delay at dispatch; push it out so the retry waits
+                state.next_allowed = max(state.next_allowed, asyncio.get_running_loop().time() + state.delay)
+                if job.attempts < self.max_retries:
+                    retry = True
+            else:
+                state.delay = max(self.min_host_delay, state.delay / 2)
+            if not retry and not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+            raise
+        except Exception as e:
+            self.failures += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            state.active -= 1
+            self._active -= 1
+            if retry and not job.future.done():
+                job.attempts += 1
+                self.retries += 1
+                self._hosts.setdefault(host, state)
+                self._enqueue(job)
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        busiest = sorted(self._hosts.items(), key=lambda kv: (kv[1].active + len(kv[1].pending)), reverse=True)[:10]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_host_concurrency": self.per_host_concurrency,
+            "active": self._active,
+            "pending": sum(len(s.pending) for s in self._hosts.values()),
+            "hosts": len(self._hosts),
+            "dispatched": self.dispatched,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+            "busiest_hosts": {
+                host: {"active": s.active, "pending": len(s.pending), "delay_seconds": round(s.delay, 2)}
+                for host, s in busiest
+            },
+        }
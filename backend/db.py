@@ -1,5 +1,5 @@
-import psycopg2
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, JSON
+from sqlalchemy import create_engine, func, Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, JSON
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -15,10 +15,28 @@ DB_USER = "postgres"
 DB_PASSWORD = "postgres" 
 DB_PORT = 5432  
 
-# SQLAlchemy setup
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(DATABASE_URL)
+# Connection pool settings (per engine, per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+# SQLAlchemy setup. The API uses the async engine (asyncpg) so queries never
+# block the event loop; the sync engine is for scripts and migrations.
+DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # User model
@@ -36,9 +54,15 @@ class Query(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     query_text = Column(String, nullable=False)
+    errors = Column(JSON, nullable=True)  # Pipeline errors for the whole query, stored once
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("User")
 
+# History (user_id + newest first) and per-user dedupe lookups. query_text is
+# indexed by its md5 so long queries don't bloat the index or hit the btree row limit.
+Index("ix_queries_user_created", Query.user_id, Query.created_at.desc())
+Index("ix_queries_user_text_md5", Query.user_id, func.md5(Query.query_text))
+
 # Response model
 class Response(Base):
     __tablename__ = "responses"
@@ -49,32 +73,54 @@ class Response(Base):
     summary = Column(String, nullable=True)
     contacts = Column(JSON, nullable=True)
     fit_score = Column(Float, nullable=True)
-    errors = Column(JSON, nullable=True)
+    errors = Column(JSON, nullable=True)  # Only the errors for this source's pages
     user_feedback = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     query = relationship("Query")
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+Index("ix_responses_query_id", Response.query_id)
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+# Company profile model: per-domain extraction results shared across users
+class CompanyProfile(Base):
+    __tablename__ = "company_profiles"
+    id = Column(Integer, primary_key=True, index=True)
+    domain = Column(String, unique=True, index=True, nullable=False)
+    base_url = Column(String, nullable=False)
+    contacts = Column(JSON, nullable=True)
+    socials = Column(JSON, nullable=True)
+    summary = Column(String, nullable=True)
+    last_crawled_at = Column(DateTime, default=datetime.utcnow)
+
+# Apply pending migrations at startup (disable to run `python migrations.py` by hand)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+async def init_db():
+    """Create missing tables and apply migrations. Called from the API lifespan, never at import."""
+    from migrations import apply_migrations
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    if DB_AUTO_MIGRATE:
+        async with async_engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            applied = await conn.run_sync(apply_migrations)
+        if applied:
+            print(f"Applied migrations: {', '.join(applied)}")
+
+async def close_db():
+    await async_engine.dispose()
+
+# Dependency to get an async DB session
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-try:
-    # Establish the connection
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        port=DB_PORT
-    )
-    print("done")
-
-except psycopg2.Error as e:
-    print(f"Error connecting to PostgreSQL: {e}")
\ No newline at end of file
+
+def pool_stats() -> dict:
+    pool = async_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for sentence embeddings.
+
+    Keys are sha256(model name + normalized text). Lookups go through an
+    in-process LRU first, then an on-disk store that survives restarts:
+    - vectors.f32: a flat float32 matrix (one row per text), read via np.memmap
+    - index.tsv:   append-only "<key>\\t<row>" lines
+    - meta.json:   embedding dimension and model name
+    Vectors are always written before their index lines, so a crash can leave
+    an orphan row but never an index entry pointing at missing data.
+    """
+
+    def __init__(self, model_name: str, cache_dir: Optional[str], lru_size: int = 4096):
+        self.model_name = model_name
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._index: Dict[str, int] = {}
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._dir = None
+        if cache_dir:
+            slug = model_name.replace("/", "__")
+            self._dir = os.path.join(cache_dir, slug)
+            os.makedirs(self._dir, exist_ok=True)
+            self._load_index()
+
+    # --- Keys ---
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join((text or "").split())
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{self.normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # --- Disk store ---
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _rows_on_disk(self) -> int:
+        if not self._dim or not os.path.exists(self._path("vectors.f32")):
+            return 0
+        return os.path.getsize(self._path("vectors.f32")) // (self._dim * 4)
+
+    def _load_index(self):
+        if os.path.exists(self._path("meta.json")):
+            with open(self._path("meta.json"), "r") as f:
+                self._dim = json.load(f).get("dim")
+        if not self._dim or not os.path.exists(self._path("index.tsv")):
+            return
+        rows = self._rows_on_disk()
+        with open(self._path("index.tsv"), "r") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 2:
+                    continue
+                row = int(parts[1])
+                if row < rows:
+                    self._index[parts[0]] = row
+
+    def _read_row(self, row: int) -> np.ndarray:
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            self._matrix = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r",
+                                     shape=(self._rows_on_disk(), self._dim))
+        return np.array(self._matrix[row])
+
+    def _append_to_disk(self, keys: List[str], vectors: np.ndarray):
+        if self._dim is None:
+            self._dim = int(vectors.shape[1])
+            with open(self._path("meta.json"), "w") as f:
+                json.dump({"model_name": self.model_name, "dim": self._dim}, f)
+        with open(self._path("index.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                start = self._rows_on_disk()
+                # Write at the last whole row, overwriting any torn partial row, so rows stay aligned with the index
+                with open(self._path("vectors.f32"), "ab") as f:
+                    f.truncate(start * self._dim * 4)
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                with open(self._path("index.tsv"), "a") as f:
+                    f.writelines(f"{k}\t{start + i}\n" for i, k in enumerate(keys))
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        for i, k in enumerate(keys):
+            self._index[k] = start + i
+
+    # --- LRU ---
+    def _remember(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, key: str) -> Optional[np.ndarray]:
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return vector
+        row = self._index.get(key)
+        if row is not None:
+            vector = self._read_row(row)
+            self._remember(key, vector)
+            self.disk_hits += 1
+            return vector
+        return None
+
+    # --- Public API ---
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Return embeddings for texts, calling encoder once with only the
+        distinct texts that are not cached yet.
+        """
+        keys = [self.key(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: "OrderedDict[str, str]" = OrderedDict()
+        with self._lock:
+            for k, t in zip(keys, texts):
+                if k in found or k in missing:
+                    continue
+                vector = self._lookup(k)
+                if vector is None:
+                    missing[k] = t
+                else:
+                    found[k] = vector
+
+        if missing:
+            vectors = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            new_keys = list(missing.keys())
+            with self._lock:
+                self.misses += len(new_keys)
+                for k, v in zip(new_keys, vectors):
+                    found[k] = v
+                    self._remember(k, v)
+                if self._dir:
+                    fresh = [i for i, k in enumerate(new_keys) if k not in self._index]
+                    if fresh:
+                        try:
+                            self._append_to_disk([new_keys[i] for i in fresh], vectors[fresh])
+                        except OSError as e:
+                            print(f"Embedding cache write failed: {e}")
+
+        return np.stack([found[k] for k in keys])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "memory_hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "lru_entries": len(self._lru),
+            "disk_entries": len(self._index),
+        }
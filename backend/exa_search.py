@@ -0,0 +1,127 @@
+import re
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from caching import TTLCache, SingleFlight
+
+
+class ExaSearchCache:
+    """
+    TTL cache and request coalescing in front of exa.search_and_contents.
+
+    Results are keyed by (query, location code, num_results) and stored as
+    plain {"url", "title", "summary"} dicts. The Exa SDK is blocking, so calls
+    run on a worker thread; concurrent identical searches share one call.
+    Saved latency is estimated as cache hits times the average uncached call.
+    """
+
+    def __init__(self, client, max_entries: int = 1024, ttl_seconds: float = 3600, **search_options):
+        self.client = client
+        self.search_options = search_options
+        self.cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.flights = SingleFlight()
+        # Metrics
+        self.fetches = 0
+        self.errors = 0
+        self.fetch_seconds = 0.0
+
+    async def search(self, query: str, location_code: str, num_results: int = 5) -> List[Dict[str, Optional[str]]]:
+        key = (query, location_code, num_results)
+        results = self.cache.get(key)
+        if results is None:
+            results = await self.flights.do(key, lambda: self._fetch(key))
+        return [dict(item) for item in results]
+
+    async def _fetch(self, key) -> List[Dict[str, Optional[str]]]:
+        query, location_code, num_results = key
+        started = time.perf_counter()
+        try:
+            response = await asyncio.to_thread(
+                self.client.search_and_contents,
+                query,
+                user_location=location_code,
+                num_results=num_results,
+                **self.search_options,
+            )
+        except Exception:
+            self.errors += 1
+            raise
+        self.fetches += 1
+        self.fetch_seconds += time.perf_counter() - started
+        results = [
+            {"url": item.url, "title": getattr(item, "title", None), "summary": getattr(item, "summary", None)}
+            for item in response.results
+        ]
+        self.cache.put(key, results)
+        return results
+
+    def stats(self) -> dict:
+        avg_fetch = self.fetch_seconds / self.fetches if self.fetches else None
+        return {
+            **self.cache.stats(),
+            "coalescing": self.flights.stats(),
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "avg_fetch_ms": round(avg_fetch * 1000, 1) if avg_fetch is not None else None,
+            "est_saved_seconds": round(self.cache.hits * avg_fetch, 2) if avg_fetch is not None else 0.0,
+        }
+
+
+class FakeExa:
+    """
+    Offline stand-in for exa_py.Exa, backed by a local JSONL of lead records
+    (url, title, org_summary, ...), such as b2b_lead_data_india.jsonl.
+
+    search_and_contents ranks records by how many query words appear in their
+    title, summary, keywords and location; search operators like -crunchbase
+    are ignored. Every call is appended to .calls so tests can count them.
+    """
+
+    def __init__(self, path: str, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls: List[dict] = []
+        self.records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("url"):
+                    self.records.append(record)
+
+    @staticmethod
+    def _words(text: str) -> set:
+        return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+    def search_and_contents(self, query: str, num_results: int = 10, **kwargs):
+        self.calls.append({"query": query, "num_results": num_results, **kwargs})
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        terms = self._words(" ".join(t for t in query.split() if not t.startswith("-")))
+        scored = []
+        seen = set()
+        for record in self.records:
+            if record["url"] in seen:
+                continue
+            seen.add(record["url"])
+            text = " ".join([
+                record.get("title") or "",
+                record.get("org_summary") or "",
+                record.get("location") or "",
+                " ".join(record.get("keywords") or []),
+            ])
+            score = len(terms & self._words(text))
+            if score:
+                scored.append((score, record))
+        scored.sort(key=lambda pair: -pair[0])
+        return SimpleNamespace(results=[
+            SimpleNamespace(url=record["url"], title=record.get("title"), summary=record.get("org_summary"))
+            for _, record in scored[:num_results]
+        ])
@@ -0,0 +1,273 @@
+"""
+Export the JSONL training log to partitioned Parquet with precomputed features.
+
+Each row carries the features lead_scorer computes at inference time: both
+embeddings (fixed-size float32 lists), cosine similarity, keyword overlap and
+the contact flags, plus the raw text, feedback and label. Training and offline
+evaluation read these columns directly instead of re-embedding every run.
+
+Layout under the output directory (hive partitioning on dt):
+    <out>/dt=YYYY-MM-DD/<source-id>.parquet    rows from one source object
+    <out>/dt=undated/<source-id>.parquet       records logged before logged_at existed
+    <out>/_export_state.json                   source objects already exported
+
+Sources are local JSONL files (--input) or the segmented S3 log. From S3 only
+the legacy object and compacted segments are exported: both are immutable and
+hold every record exactly once, while live parts are still due to be merged.
+Pass --compact to compact old parts first. Output files are named after their
+source object, so re-exporting a source overwrites rather than duplicates.
+
+    python export_training_data.py --compact
+    python export_training_data.py --input b2b_lead_data_india.jsonl --out training_features
+"""
+import os
+import glob
+import json
+import hashlib
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+TRAINING_FEATURES_DIR = os.getenv("TRAINING_FEATURES_DIR", "training_features")
+STATE_FILE = "_export_state.json"
+
+
+def feedback_label(feedback: Optional[str]) -> Optional[int]:
+    """'Good Fit' -> 1, any other feedback -> 0, no feedback -> None (unlabeled)."""
+    if not feedback:
+        return None
+    return 1 if feedback == "Good Fit" else 0
+
+
+def _partition(record: dict) -> str:
+    logged_at = record.get("logged_at")
+    return logged_at[:10] if isinstance(logged_at, str) and len(logged_at) >= 10 else "undated"
+
+
+def _source_id(source: str) -> str:
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
+def _schema(dim: int):
+    import pyarrow as pa
+    vector = pa.list_(pa.float32(), dim)
+    return pa.schema([
+        ("original_user_query", pa.string()),
+        ("org_summary", pa.string()),
+        ("email", pa.string()),
+        ("phone", pa.string()),
+        ("contact_title", pa.string()),
+        ("user_feedback", pa.string()),
+        ("label", pa.int8()),
+        ("logged_at", pa.string()),
+        ("source", pa.string()),
+        ("embedding_model", pa.string()),
+        ("query_embedding", vector),
+        ("company_embedding", vector),
+        ("has_contact_title", pa.int8()),
+        ("has_phone", pa.int8()),
+        ("has_email", pa.int8()),
+        ("cosine_sim", pa.float64()),
+        ("keyword_overlap", pa.float64()),
+    ])
+
+
+def featurize(records: List[dict], source: str):
+    """Compute features for a batch of raw records. Returns a pyarrow Table."""
+    import pyarrow as pa
+    from lead_scorer import pair_features
+    from model_registry import EMBEDDING_MODEL_NAME
+
+    queries = [r.get("original_user_query") or "" for r in records]
+    companies = [
+        {"org_summary": r.get("org_summary") or "", "contact_info": r.get("contact_info") or {}}
+        for r in records
+    ]
+    query_embs, company_embs, flags, cosine_sims, overlaps = pair_features(queries, companies)
+    dim = query_embs.shape[1]
+    contacts = [c["contact_info"] if isinstance(c["contact_info"], dict) else {} for c in companies]
+
+    def vectors(matrix: np.ndarray):
+        flat = pa.array(np.ascontiguousarray(matrix, dtype=np.float32).ravel(), type=pa.float32())
+        return pa.FixedSizeListArray.from_arrays(flat, dim)
+
+    columns = {
+        "original_user_query": queries,
+        "org_summary": [c["org_summary"] for c in companies],
+        "email": [c.get("email") for c in contacts],
+        "phone": [c.get("phone") for c in contacts],
+        "contact_title": [c.get("contact_title") for c in contacts],
+        "user_feedback": [r.get("user_feedback") or "" for r in records],
+        "label": [feedback_label(r.get("user_feedback")) for r in records],
+        "logged_at": [r.get("logged_at") for r in records],
+        "source": [source] * len(records),
+        "embedding_model": [EMBEDDING_MODEL_NAME] * len(records),
+        "query_embedding": vectors(query_embs),
+        "company_embedding": vectors(company_embs),
+        "has_contact_title": flags[:, 0],
+        "has_phone": flags[:, 1],
+        "has_email": flags[:, 2],
+        "cosine_sim": cosine_sims,
+        "keyword_overlap": overlaps,
+    }
+    return pa.Table.from_pydict(columns, schema=_schema(dim))
+
+
+def export_records(records: Iterable[dict], source: str, out_dir: str, batch_size: int = 512) -> int:
+    """Featurize one source's records and write one Parquet file per dt partition."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    by_partition: Dict[str, List[dict]] = {}
+    for record in records:
+        by_partition.setdefault(_partition(record), []).append(record)
+
+    rows = 0
+    for dt, batch_records in sorted(by_partition.items()):
+        tables = [
+            featurize(batch_records[i:i + batch_size], source)
+            for i in range(0, len(batch_records), batch_size)
+        ]
+        table = pa.concat_tables(tables)
+        directory = os.path.join(out_dir, f"dt={dt}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{_source_id(source)}.parquet")
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        rows += table.num_rows
+    return rows
+
+
+def read_local_jsonl(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def s3_sources(log) -> List[str]:
+    """Immutable objects of the segmented log: legacy object first, then segments."""
+    keys = [log.legacy_key] if log.legacy_key else []
+    return keys + [s["key"] for s in log.read_manifest()["segments"]]
+
+
+def load_state(out_dir: str) -> dict:
+    path = os.path.join(out_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"exported": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(out_dir: str, state: dict):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def load_feature_table(out_dir: str = TRAINING_FEATURES_DIR, labeled_only: bool = True, min_dt: Optional[str] = None,
+                       sources: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None):
+    """
+    Read the exported features back as one pyarrow Table. min_dt (YYYY-MM-DD)
+    keeps only dated partitions on or after that day; sources limits the read
+    to those source objects' files. Both prune files without opening them.
+    """
+    import pyarrow.dataset as ds
+
+    paths = sorted(glob.glob(os.path.join(out_dir, "dt=*", "*.parquet")))
+    if sources is not None:
+        wanted = {f"{_source_id(source)}.parquet" for source in sources}
+        paths = [path for path in paths if os.path.basename(path) in wanted]
+    if min_dt is not None:
+        paths = [
+            path for path in paths
+            if os.path.basename(os.path.dirname(path)) != "dt=undated" and os.path.basename(os.path.dirname(path)) >= f"dt={min_dt}"
+        ]
+    if not paths:
+        return None
+    dataset = ds.dataset(paths, format="parquet", partitioning="hive", partition_base_dir=out_dir)
+    condition = ds.field("label").is_valid() if labeled_only else None
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def feature_arrays(table) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, y) from an exported table, in the column order the scorer uses."""
+    from lead_scorer import stack_features
+
+    def vectors(name: str) -> np.ndarray:
+        column = table.column(name).combine_chunks()
+        return column.flatten().to_numpy(zero_copy_only=False).reshape(len(column), -1)
+
+    flags = np.column_stack([table.column(name).to_numpy() for name in ("has_contact_title", "has_phone", "has_email")])
+    X = stack_features(
+        vectors("query_embedding"),
+        vectors("company_embedding"),
+        flags,
+        table.column("cosine_sim").to_numpy(),
+        table.column("keyword_overlap").to_numpy(),
+    )
+    return X, table.column("label").to_numpy().astype(np.int64)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Export the JSONL training log to Parquet with precomputed features.")
+    parser.add_argument("--out", default=TRAINING_FEATURES_DIR, help="Output directory (default env TRAINING_FEATURES_DIR)")
+    parser.add_argument("--input", action="append", default=[], help="Local JSONL file to export (repeatable). Without it the S3 log is read")
+    parser.add_argument("--bucket", default=None, help="S3 bucket name (overrides env S3_BUCKET_NAME)")
+    parser.add_argument("--prefix", default=None, help="Log prefix (overrides env S3_JSONL_PREFIX)")
+    parser.add_argument("--region", default=None, help="AWS region (overrides env AWS_REGION)")
+    parser.add_argument("--compact", action="store_true", help="Compact old S3 parts into a segment before exporting")
+    parser.add_argument("--min-age", type=int, default=300, help="With --compact, only compact parts older than this many seconds")
+    parser.add_argument("--full", action="store_true", help="Re-export sources that were already exported")
+    parser.add_argument("--batch-size", type=int, default=512, help="Records featurized per embedding batch")
+    args = parser.parse_args()
+
+    load_dotenv()
+    state = load_state(args.out)
+    exported = set(state["exported"])
+
+    if args.input:
+        sources = [(os.path.abspath(path), lambda path=path: read_local_jsonl(path)) for path in args.input]
+        # Local files can change between runs, so they are always re-exported
+        skip = set()
+    else:
+        from s3_client import create_s3_client
+        from training_log import SegmentedJsonlLog, S3_JSONL_PREFIX
+
+        bucket = args.bucket or os.getenv("S3_BUCKET_NAME", "outreachdata")
+        log = SegmentedJsonlLog(
+            create_s3_client(args.region or os.getenv("AWS_REGION")),
+            bucket,
+            args.prefix or os.getenv("S3_JSONL_PREFIX", S3_JSONL_PREFIX),
+            legacy_key=os.getenv("S3_JSONL_KEY", "b2b_lead_data_india.jsonl"),
+        )
+        if args.compact:
+            segment = log.compact(min_age_seconds=args.min_age)
+            print(f"Compacted into s3://{bucket}/{segment}" if segment else "Nothing to compact")
+        sources = [
+            (f"s3://{bucket}/{key}", lambda key=key: (json.loads(line) for line in log.iter_lines(key)))
+            for key in s3_sources(log)
+        ]
+        skip = set() if args.full else exported
+
+    total = 0
+    for source, reader in sources:
+        if source in skip:
+            continue
+        rows = export_records(reader(), source, args.out, batch_size=args.batch_size)
+        total += rows
+        exported.add(source)
+        print(f"Exported {rows} row(s) from {source}")
+        state["exported"] = sorted(exported)
+        save_state(args.out, state)
+    print(f"Done: {total} row(s) written under {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from lead_scorer import score_pairs
+
+
+@dataclass
+class _ScoreJob:
+    query: str
+    companies: List[dict]
+    future: asyncio.Future
+
+
+class InferenceExecutor:
+    """
+    Runs lead scoring off the event loop with micro-batching.
+
+    Async handlers await score(); jobs land in a bounded asyncio queue. A
+    dispatcher task takes the first waiting job, keeps collecting for up to
+    batch_window_ms (or until max_batch_size rows), and sends the combined
+    batch to a dedicated thread pool as one score_pairs call, so concurrent
+    requests share one embedder batch and one model call. The transformer and
+    XGBoost release the GIL for the heavy lifting, so threads are enough and
+    the models stay loaded once per process.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 256, batch_window_ms: float = 5.0, max_batch_size: int = 128):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        # Metrics
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.inference_seconds = 0.0
+
+    def start(self):
+        if self._dispatcher is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        if self._dispatcher is None:
+            return
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._pool.shutdown(wait=False)
+        self._dispatcher = None
+
+    async def score(self, query: str, companies: List[dict]) -> List[float]:
+        if not companies:
+            return []
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_ScoreJob(query, companies, future))
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            batch = [job]
+            rows = len(job.companies)
+            deadline = loop.time() + self.batch_window
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    job = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(job)
+                rows += len(job.companies)
+            await self._slots.acquire()
+            task = asyncio.create_task(self._execute(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, batch: List[_ScoreJob]):
+        queries = [job.query for job in batch for _ in job.companies]
+        companies = [c for job in batch for c in job.companies]
+        started = time.perf_counter()
+        try:
+            scores = await asyncio.get_running_loop().run_in_executor(self._pool, score_pairs, queries, companies)
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+            self.inference_seconds += time.perf_counter() - started
+            self.requests += len(batch)
+            self.batches += 1
+            self.rows += len(companies)
+            self.last_batch_size = len(companies)
+            self.max_batch_seen = max(self.max_batch_seen, len(companies))
+        offset = 0
+        for job in batch:
+            n = len(job.companies)
+            if not job.future.done():
+                job.future.set_result(scores[offset:offset + n])
+            offset += n
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "batches_in_flight": len(self._in_flight),
+            "requests": self.requests,
+            "batches": self.batches,
+            "rows_scored": self.rows,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_seen,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "inference_seconds": round(self.inference_seconds, 3),
+        }
+
+
+inference_executor = InferenceExecutor(
+    max_workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "256")),
+    batch_window_ms=float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5")),
+    max_batch_size=int(os.getenv("INFERENCE_MAX_BATCH", "128")),
+)
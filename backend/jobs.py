@@ -0,0 +1,183 @@
+import time
+import uuid
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class ExtractionJob:
+    id: str
+    user_id: int
+    query_text: str
+    status: str = "queued"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total_sources: Optional[int] = None
+    processed_sources: int = 0
+    results: Dict[str, dict] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    query_id: Optional[int] = None
+    error: Optional[str] = None
+    # time.monotonic() at finish, used for retention (finished_at is naive UTC)
+    finished_monotonic: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "query_text": self.query_text,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {"completed": self.processed_sources, "total": self.total_sources},
+            "contacts_found": dict(self.results),
+            "errors": dict(self.errors),
+            "query_id": self.query_id,
+            "error": self.error,
+        }
+
+
+def _dedupe_key(user_id: int, query_text: str) -> Tuple[int, str]:
+    return user_id, " ".join(query_text.split()).lower()
+
+
+class ExtractionJobQueue:
+    """
+    In-process extraction job subsystem.
+
+    submit() registers a job and puts it on a bounded asyncio queue; a fixed
+    number of worker tasks pull jobs and drive the extraction event pipeline
+    (runner), recording progress and partial per-source results as events
+    arrive. A user submitting the same query text while a job for it is still
+    queued or running gets that job back instead of a duplicate. Finished jobs
+    are kept for retention_seconds so clients can collect the results.
+    """
+
+    def __init__(self, runner: Callable[[int, str], AsyncIterator[dict]], workers: int = 2, max_queued: int = 100, retention_seconds: int = 3600):
+        self.runner = runner
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, ExtractionJob] = {}
+        self._active: Dict[Tuple[int, str], str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, user_id: int, query_text: str) -> Tuple[ExtractionJob, bool]:
+        """Returns (job, deduplicated)."""
+        self.start()
+        self._prune()
+        key = _dedupe_key(user_id, query_text)
+        existing_id = self._active.get(key)
+        if existing_id is not None and self._jobs[existing_id].active:
+            self.deduplicated += 1
+            return self._jobs[existing_id], True
+
+        job = ExtractionJob(id=uuid.uuid4().hex, user_id=user_id, query_text=query_text)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+        self._jobs[job.id] = job
+        self._active[key] = job.id
+        self.submitted += 1
+        return job, False
+
+    def get(self, job_id: str) -> Optional[ExtractionJob]:
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if not job.active and job.finished_monotonic is not None and job.finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ExtractionJob):
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        try:
+            async for event in self.runner(job.user_id, job.query_text):
+                kind = event.get("type")
+                if kind == "sources":
+                    job.total_sources = len(event["base_urls"])
+                elif kind == "source":
+                    job.results[event["base_url"]] = event["result"]
+                    job.processed_sources += 1
+                elif kind == "source_empty":
+                    job.processed_sources += 1
+                elif kind == "summary":
+                    job.query_id = event.get("query_id")
+                    job.errors = event.get("errors") or {}
+                elif kind == "error":
+                    job.error = event.get("detail")
+            job.status = "failed" if job.error else "completed"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Job cancelled during shutdown"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"Extraction failed: {str(e)}"
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.finished_monotonic = time.monotonic()
+            if job.status == "completed":
+                self.completed += 1
+            else:
+                self.failed += 1
+            key = _dedupe_key(job.user_id, job.query_text)
+            if self._active.get(key) == job.id:
+                del self._active[key]
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queued,
+            "jobs_by_status": statuses,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
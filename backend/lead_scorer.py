@@ -1,20 +1,28 @@
-import joblib
+import os
+from typing import List
 import numpy as np
-import nltk
-from sentence_transformers import SentenceTransformer
 from pydantic import BaseModel
-from nltk.corpus import stopwords
+from embedding_cache import EmbeddingCache
+from model_registry import registry, EMBEDDING_MODEL_NAME
 
-# Download stopwords if not already
-nltk.download('stopwords', quiet=True)
-stop_words = set(stopwords.words('english'))
+# Stopword list bundled with the repo (NLTK english), so import never hits the network
+_STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords_english.txt")
+with open(_STOPWORDS_PATH, "r", encoding="utf-8") as _f:
+    stop_words = set(line.strip() for line in _f if line.strip())
 
-# Load saved model and scaler
-model = joblib.load('xgboost_lead_scorer_optimized.pkl')
-scaler = joblib.load('feature_scaler_optimized.pkl')
+# Embedding cache: in-process LRU in front of a persistent on-disk store
+embedding_cache = EmbeddingCache(
+    EMBEDDING_MODEL_NAME,
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings") or None,
+    lru_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")),
+)
 
-# Load embedding model
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """Embed texts, only running the transformer for texts not already cached."""
+    def _encode(missing):
+        registry.ensure_loaded()
+        return registry.embedder.encode(missing)
+    return embedding_cache.encode(texts, _encode)
 
 class LeadRequest(BaseModel):
     query: str
@@ -29,6 +37,12 @@ def safe_cosine_sim(q, c):
         return 0.0
     return np.dot(q, c) / (norm_q * norm_c)
 
+# Utility: row-wise cosine similarity between matching rows of two matrices
+def rowwise_cosine_sim(Q, C):
+    norms = np.linalg.norm(Q, axis=1) * np.linalg.norm(C, axis=1)
+    dots = np.einsum('ij,ij->i', Q, C)
+    return np.divide(dots, norms, out=np.zeros_like(dots, dtype=np.float64), where=norms != 0)
+
 # Utility: keyword overlap
 def keyword_overlap(query, summary):
     query_words = set(query.lower().split()) - stop_words
@@ -37,34 +51,70 @@ def keyword_overlap(query, summary):
         return 0.0
     return len(query_words.intersection(summary_words)) / len(query_words)
 
-def predict_fit_score(new_query, new_company_data):
-    # Extract text
-    new_company_text = new_company_data['org_summary']
-    
-    # Contact features
-    contact_info = new_company_data.get('contact_info', {})
-    new_has_contact_title = 1 if isinstance(contact_info, dict) and contact_info.get('contact_title') else 0
-    new_has_phone = 1 if isinstance(contact_info, dict) and contact_info.get('phone') else 0
-    new_has_email = 1 if isinstance(contact_info, dict) and contact_info.get('email') else 0
+# Utility: contact presence flags (contact_title, phone, email)
+def contact_flags(contact_info):
+    if not isinstance(contact_info, dict):
+        return [0, 0, 0]
+    return [
+        1 if contact_info.get('contact_title') else 0,
+        1 if contact_info.get('phone') else 0,
+        1 if contact_info.get('email') else 0,
+    ]
+
+def pair_features(queries: List[str], companies: List[dict]):
+    """
+    Per-pair feature blocks for (query, company) pairs:
+    (query_embs, company_embs, flags, cosine_sims, overlaps).
+    Distinct queries and all org summaries are embedded in one cached batch.
+    """
+    summaries = [c.get('org_summary') or '' for c in companies]
+    unique_queries = list(dict.fromkeys(queries))
+    query_rows = {q: i for i, q in enumerate(unique_queries)}
 
     # Embeddings
-    new_query_emb = embedder.encode([new_query])[0]
-    new_company_emb = embedder.encode([new_company_text])[0]
+    embeddings = encode_texts(unique_queries + summaries)
+    query_embs = embeddings[[query_rows[q] for q in queries]]
+    company_embs = embeddings[len(unique_queries):]
 
     # Similarity + overlap
-    new_cosine_sim = safe_cosine_sim(new_query_emb, new_company_emb)
-    new_overlap = keyword_overlap(new_query, new_company_text)
-
-    # Combine features
-    new_X_emb = np.concatenate((new_query_emb, new_company_emb))  # embeddings
-    new_X_emb = np.expand_dims(new_X_emb, axis=0)
-    new_X_additional = np.array([[new_has_contact_title, new_has_phone, new_has_email]])
-    new_X_sim = np.array([[new_cosine_sim]])
-    new_X_overlap = np.array([[new_overlap]])
-
-    new_X = np.hstack((new_X_emb, new_X_additional, new_X_sim, new_X_overlap))
-    new_X = scaler.transform(new_X)
-
-    # Predict fit score
-    fit_score = model.predict_proba(new_X)[0][1] * 100
-    return round(fit_score, 2)
+    cosine_sims = rowwise_cosine_sim(query_embs, company_embs)
+    overlaps = np.array([keyword_overlap(q, s) for q, s in zip(queries, summaries)], dtype=np.float64)
+
+    flags = np.array([contact_flags(c.get('contact_info', {})) for c in companies]).reshape(-1, 3)
+    return query_embs, company_embs, flags, cosine_sims, overlaps
+
+def stack_features(query_embs, company_embs, flags, cosine_sims, overlaps) -> np.ndarray:
+    """Column order the scaler and model were trained on."""
+    return np.hstack((query_embs, company_embs, flags, np.asarray(cosine_sims).reshape(-1, 1), np.asarray(overlaps).reshape(-1, 1)))
+
+def build_feature_matrix(queries: List[str], companies: List[dict]) -> np.ndarray:
+    """
+    Build the unscaled feature matrix for (query, company) pairs:
+    [query_emb | company_emb | has_contact_title, has_phone, has_email | cosine | overlap].
+    """
+    return stack_features(*pair_features(queries, companies))
+
+def score_pairs(queries: List[str], companies: List[dict]) -> List[float]:
+    """
+    Score (query, company) pairs with a single scaler and model call.
+    Each company dict has 'org_summary' and an optional 'contact_info'.
+    """
+    if not companies:
+        return []
+    X = build_feature_matrix(queries, companies)
+    registry.ensure_loaded()
+
+    # Predict fit scores (active version; the shadow version, if any, scores in the background)
+    probabilities = registry.score(X)
+    return [round(float(p), 2) for p in probabilities]
+
+def predict_fit_scores(query: str, companies: List[dict]) -> List[float]:
+    """
+    Score many companies against a single query in one pass.
+    The query is encoded once, all org summaries go through the embedder as one
+    batch, and the scaler and model each run once on the full feature matrix.
+    """
+    return score_pairs([query] * len(companies), companies)
+
+def predict_fit_score(new_query, new_company_data):
+    return predict_fit_scores(new_query, [new_company_data])[0]
@@ -0,0 +1,222 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+import litellm
+
+from caching import TTLCache, SingleFlight
+from rate_limit import TokenBucketLimiter
+
+DEFAULT_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash")
+
+_FENCED = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
+
+
+def parse_json_response(content: str) -> Any:
+    """
+    Parse a JSON reply that may be wrapped in a markdown code fence.
+    Example: '```json\\n{"a": 1}\\n```' -> {"a": 1}
+    """
+    content = (content or "").strip()
+    fenced = _FENCED.search(content)
+    if fenced:
+        content = fenced.group(1)
+    return json.loads(content)
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """'model-a=4,model-b=2' -> {"model-a": 4, "model-b": 2}"""
+    limits = {}
+    for part in spec.split(","):
+        model, _, value = part.strip().rpartition("=")
+        if model and value.isdigit():
+            limits[model] = int(value)
+    return limits
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return isinstance(error, litellm.RateLimitError) or getattr(error, "status_code", None) == 429
+
+
+class LLMGateway:
+    """
+    Single entry point for LLM completions, so every caller shares one policy.
+
+    Each attempt takes a token from a per-model token bucket (requests per
+    minute), then a slot from the global semaphore and the model's semaphore.
+    429 responses are retried with full-jitter exponential backoff; other
+    errors are raised to the caller. Successful replies are cached by
+    sha256(model + prompt), and identical prompts in flight share one call.
+    Latency, retries and token usage are recorded per purpose.
+    """
+
+    def __init__(
+        self,
+        default_model: str = DEFAULT_MODEL,
+        max_concurrency: int = 16,
+        model_concurrency: int = 8,
+        model_limits: Optional[Dict[str, int]] = None,
+        requests_per_minute: float = 1000,
+        burst: int = 20,
+        max_retries: int = 4,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 30.0,
+        timeout_seconds: float = 60.0,
+        cache_entries: int = 2048,
+        cache_ttl_seconds: float = 3600,
+    ):
+        self.default_model = default_model
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base_seconds
+        self.backoff_max = backoff_max_seconds
+        self.timeout = timeout_seconds
+        self.limiter = TokenBucketLimiter(rate_per_minute=requests_per_minute, burst=burst, max_keys=1024)
+        self.cache = TTLCache(max_entries=cache_entries, ttl_seconds=cache_ttl_seconds)
+        self.flights = SingleFlight()
+        self._global_slots: Optional[asyncio.Semaphore] = None
+        self._model_slots: Dict[str, asyncio.Semaphore] = {}
+        self._active = 0
+        # Metrics, keyed by purpose
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.throttled_seconds = 0.0
+
+    def _slots(self, model: str):
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        if model not in self._model_slots:
+            self._model_slots[model] = asyncio.Semaphore(self.model_limits.get(model, self.model_concurrency))
+        return self._global_slots, self._model_slots[model]
+
+    def _record(self, purpose: str, **values):
+        entry = self._stats.setdefault(purpose, {
+            "calls": 0, "errors": 0, "retries": 0, "cache_hits": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0, "max_seconds": 0.0,
+        })
+        for name, value in values.items():
+            if name == "max_seconds":
+                entry[name] = max(entry[name], value)
+            else:
+                entry[name] += value
+
+    @staticmethod
+    def _cache_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    async def complete(self, prompt: str, model: Optional[str] = None, purpose: str = "default", cache: bool = True) -> str:
+        """Text of the model's reply to a single user message."""
+        model = model or self.default_model
+        if not cache:
+            return await self._call(model, prompt, purpose)
+        key = self._cache_key(model, prompt)
+        content = self.cache.get(key)
+        if content is not None:
+            self._record(purpose, cache_hits=1)
+            return content
+        content = await self.flights.do(key, lambda: self._call(model, prompt, purpose))
+        self.cache.put(key, content)
+        return content
+
+    async def complete_json(self, prompt: str, model: Optional[str] = None, purpose: str = "default", cache: bool = True) -> Any:
+        """Like complete(), with the reply parsed by parse_json_response. Unparseable replies are not cached."""
+        content = await self.complete(prompt, model=model, purpose=purpose, cache=cache)
+        try:
+            return parse_json_response(content)
+        except ValueError:
+            self.cache.pop(self._cache_key(model or self.default_model, prompt))
+            raise
+
+    async def _acquire_rate_token(self, model: str):
+        while True:
+            wait = self.limiter.allow(model)
+            if wait is None:
+                return
+            self.throttled_seconds += wait
+            await asyncio.sleep(wait)
+
+    async def _call(self, model: str, prompt: str, purpose: str) -> str:
+        global_slots, model_slots = self._slots(model)
+        attempt = 0
+        while True:
+            await self._acquire_rate_token(model)
+            async with global_slots, model_slots:
+                self._active += 1
+                started = time.perf_counter()
+                try:
+                    response = await litellm.acompletion(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        api_key=os.getenv("GEMINI_API_KEY") if model.startswith("gemini/") else None,
+                        timeout=self.timeout,
+                    )
+                except Exception as e:
+                    if not _is_rate_limited(e) or attempt >= self.max_retries:
+                        self._record(purpose, calls=1, errors=1)
+                        raise
+                    error = e
+                else:
+                    elapsed = time.perf_counter() - started
+                    usage = getattr(response, "usage", None)
+                    self._record(
+                        purpose,
+                        calls=1,
+                        seconds=elapsed,
+                        max_seconds=elapsed,
+                        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                    )
+                    return (response.choices[0].message.content or "").strip()
+                finally:
+                    self._active -= 1
+            # Rate limited: back off outside the semaphores so other calls can proceed
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            attempt += 1
+            self._record(purpose, retries=1)
+            print(f"LLM rate limited ({model}, {purpose}): {error}; retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        by_purpose = {}
+        for purpose, entry in self._stats.items():
+            succeeded = entry["calls"] - entry["errors"]
+            by_purpose[purpose] = {
+                "calls": int(entry["calls"]),
+                "errors": int(entry["errors"]),
+                "retries": int(entry["retries"]),
+                "cache_hits": int(entry["cache_hits"]),
+                "prompt_tokens": int(entry["prompt_tokens"]),
+                "completion_tokens": int(entry["completion_tokens"]),
+                "avg_ms": round(entry["seconds"] / succeeded * 1000, 1) if succeeded else None,
+                "max_ms": round(entry["max_seconds"] * 1000, 1),
+            }
+        return {
+            "default_model": self.default_model,
+            "max_concurrency": self.max_concurrency,
+            "model_concurrency": {model: self.model_limits.get(model, self.model_concurrency) for model in self._model_slots},
+            "active": self._active,
+            "throttled_seconds": round(self.throttled_seconds, 2),
+            "rate_limit": self.limiter.stats(),
+            "cache": self.cache.stats(),
+            "coalescing": self.flights.stats(),
+            "by_purpose": by_purpose,
+        }
+
+
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+    model_concurrency=int(os.getenv("LLM_MODEL_CONCURRENCY", "8")),
+    model_limits=_parse_limits(os.getenv("LLM_MODEL_CONCURRENCY_OVERRIDES", "")),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000")),
+    burst=int(os.getenv("LLM_RATE_BURST", "20")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    timeout_seconds=float(os.getenv("LLM_TIMEOUT_SECONDS", "60")),
+    cache_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")),
+    cache_ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+)
@@ -0,0 +1,116 @@
+"""
+Measures how a burst of sign-ins affects latency on another endpoint.
+
+Runs a steady probe load against /extract (or any --probe-path) twice: once on
+its own and once while --storm-concurrency clients sign in as fast as they
+can. With hashing inline on the event loop the storm phase inflates probe
+latency by roughly the pbkdf2 cost times the login concurrency; with the
+hashing pool it should stay close to the baseline.
+
+    uvicorn app:app --port 8000 &
+    python load_test_login_storm.py --email load@example.com --password secret
+
+/extract calls Exa and the LLM, so runs cost API credits; --probe-path /health
+--probe-method GET measures event-loop stalls on their own. Storm accounts are
+created on first use; each gets its own login bucket, so raise LOGIN_RATE_BURST
+and LOGIN_RATE_PER_MINUTE on the server if you want every sign-in to hash
+rather than be rate limited.
+"""
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import List
+
+import httpx
+
+
+async def ensure_account(client: httpx.AsyncClient, email: str, password: str) -> str:
+    response = await client.post("/signin", data={"username": email, "password": password})
+    if response.status_code == 401:
+        response = await client.post("/signup", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000 if ordered else 0.0
+
+
+async def probe(client: httpx.AsyncClient, args, headers: dict, deadline: float, latencies: List[float], statuses: Counter):
+    body = {"query": args.query}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if args.probe_method == "GET":
+            response = await client.get(args.probe_path, headers=headers)
+        else:
+            response = await client.post(args.probe_path, headers=headers, json=body)
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+
+
+async def storm(client: httpx.AsyncClient, accounts: List[str], password: str, offset: int, deadline: float, statuses: Counter):
+    i = offset
+    while time.perf_counter() < deadline:
+        email = accounts[i % len(accounts)]
+        response = await client.post("/signin", data={"username": email, "password": password})
+        statuses[response.status_code] += 1
+        i += 1
+
+
+async def phase(name: str, client: httpx.AsyncClient, args, headers: dict, accounts: List[str]):
+    latencies: List[float] = []
+    probe_statuses: Counter = Counter()
+    storm_statuses: Counter = Counter()
+    deadline = time.perf_counter() + args.duration
+    tasks = [probe(client, args, headers, deadline, latencies, probe_statuses) for _ in range(args.probe_concurrency)]
+    if accounts:
+        tasks += [storm(client, accounts, args.password, n, deadline, storm_statuses) for n in range(args.storm_concurrency)]
+    await asyncio.gather(*tasks)
+
+    print(f"[{name}] probe {args.probe_method} {args.probe_path}: {len(latencies)} requests  statuses={dict(probe_statuses)}")
+    print(f"[{name}] probe latency ms: p50={percentile(latencies, 0.50):.1f}  p95={percentile(latencies, 0.95):.1f}  p99={percentile(latencies, 0.99):.1f}")
+    if accounts:
+        print(f"[{name}] sign-ins: {sum(storm_statuses.values())}  statuses={dict(storm_statuses)}")
+    return latencies
+
+
+async def run(args):
+    connections = args.probe_concurrency + args.storm_concurrency
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        token = await ensure_account(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        local, _, domain = args.email.partition("@")
+        accounts = [f"{local}+storm{n}@{domain}" for n in range(args.storm_accounts)]
+        for email in accounts:
+            await ensure_account(client, email, args.password)
+
+        baseline = await phase("baseline", client, args, headers, [])
+        stormed = await phase("storm", client, args, headers, accounts)
+        if baseline and stormed:
+            print(f"p95 change under storm: {percentile(stormed, 0.95) - percentile(baseline, 0.95):+.1f} ms")
+        metrics = (await client.get("/metrics")).json()
+        print(f"Password hashing: {metrics.get('password_hashing')}")
+        print(f"Login rate limit: {metrics.get('login_rate_limit')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare endpoint latency with and without a concurrent sign-in storm.")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--email", default="load@example.com", help="Account used for the probe requests")
+    parser.add_argument("--password", default="load-password")
+    parser.add_argument("--probe-path", default="/extract")
+    parser.add_argument("--probe-method", choices=["GET", "POST"], default="POST")
+    parser.add_argument("--query", default="marketing agencies in Austin", help="Query sent to POST probes")
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    parser.add_argument("--storm-concurrency", type=int, default=32)
+    parser.add_argument("--storm-accounts", type=int, default=32, help="Distinct accounts the storm signs in as")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per phase")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Forward-only schema migrations for databases created before a schema change.
+
+Fresh databases get the full schema from Base.metadata.create_all; migrations
+bring existing ones up to date. Each migration is a list of idempotent SQL
+statements, applied once in order and recorded in schema_migrations. Indexes
+are built with CREATE INDEX CONCURRENTLY so large tables stay writable, which
+means statements run outside a transaction (AUTOCOMMIT); an interrupted
+migration is simply re-run. An advisory lock keeps workers that start at the
+same time from racing each other.
+
+    python migrations.py            apply pending migrations
+    python migrations.py status     list applied and pending migrations
+"""
+import re
+import argparse
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+MIGRATIONS: List[Tuple[str, List[str]]] = [
+    ("0001_history_and_lookup_indexes", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_queries_user_created ON queries (user_id, created_at DESC)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_queries_user_text_md5 ON queries (user_id, md5(query_text))",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_responses_query_id ON responses (query_id)",
+    ]),
+    ("0002_query_errors", [
+        "ALTER TABLE queries ADD COLUMN IF NOT EXISTS errors JSON",
+    ]),
+]
+
+# Indexes created by the migrations above; only these are ever dropped when left INVALID
+OWNED_INDEXES = sorted(set(re.findall(
+    r"CREATE INDEX CONCURRENTLY IF NOT EXISTS (\w+)",
+    "\n".join(statement for _, statements in MIGRATIONS for statement in statements),
+)))
+
+# Arbitrary key for pg_advisory_lock, shared by every process running migrations
+MIGRATION_LOCK_KEY = 740_118_201
+
+
+def _drop_invalid_indexes(conn):
+    """
+    A failed CONCURRENTLY build leaves an INVALID index that IF NOT EXISTS would
+    skip. Only our own indexes are considered: an invalid index of another name
+    may be a build still in progress elsewhere.
+    """
+    invalid = conn.execute(text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE NOT i.indisvalid AND n.nspname = current_schema() AND c.relname = ANY(:names)"
+    ), {"names": OWNED_INDEXES}).scalars().all()
+    for name in invalid:
+        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def applied_migrations(conn) -> List[str]:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+    return conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+
+
+def apply_migrations(conn) -> List[str]:
+    """Apply pending migrations on an AUTOCOMMIT connection. Returns the versions applied."""
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    try:
+        done = set(applied_migrations(conn))
+        applied = []
+        for version, statements in MIGRATIONS:
+            if version in done:
+                continue
+            _drop_invalid_indexes(conn)
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_migrations (version) VALUES (:version)"), {"version": version})
+            applied.append(version)
+        return applied
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def main():
+    from db import engine, Base
+
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations.")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if args.command == "status":
+            done = set(applied_migrations(conn))
+            for version, _ in MIGRATIONS:
+                print(f"{'applied' if version in done else 'pending'}  {version}")
+            return
+        Base.metadata.create_all(conn)
+        applied = apply_migrations(conn)
+        print(f"Applied: {', '.join(applied)}" if applied else "Database is up to date")
+
+
+if __name__ == "__main__":
+    main()
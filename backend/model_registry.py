@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MODEL_PATH = os.getenv("LEAD_SCORER_MODEL_PATH", "xgboost_lead_scorer_optimized.pkl")
+SCALER_PATH = os.getenv("LEAD_SCORER_SCALER_PATH", "feature_scaler_optimized.pkl")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Versioned artifacts written by train.py: <MODEL_DIR>/<version>/{model.pkl,scaler.pkl,meta.json}
+# plus <MODEL_DIR>/CURRENT naming the version to serve and an optional
+# <MODEL_DIR>/SHADOW naming a candidate scored alongside it. Without CURRENT
+# the root pkl files are served as version "legacy".
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+LEGACY_VERSION = "legacy"
+# Shadow batches waiting to be scored; more than this and new ones are dropped
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "8"))
+SCORE_BUCKETS = 10
+
+
+@dataclass(frozen=True)
+class ScorerArtifacts:
+    """A model and the scaler it was trained with; always swapped together."""
+    version: str
+    model: Any
+    scaler: Any
+    meta: dict = field(default_factory=dict)
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Fit scores (0-100) for an unscaled feature matrix."""
+        return self.model.predict_proba(self.scaler.transform(X))[:, 1] * 100
+
+
+class VersionStats:
+    """Latency and score-distribution counters for one model version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.score_sum = 0.0
+        self.histogram = np.zeros(SCORE_BUCKETS, dtype=np.int64)
+        # Shadow versions only: comparison with the active version's scores
+        self.compared = 0
+        self.abs_diff_sum = 0.0
+        self.agreements = 0
+
+    def record(self, scores: np.ndarray, seconds: float, reference: Optional[np.ndarray] = None):
+        counts, _ = np.histogram(scores, bins=SCORE_BUCKETS, range=(0, 100))
+        with self._lock:
+            self.batches += 1
+            self.rows += len(scores)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.score_sum += float(np.sum(scores))
+            self.histogram += counts
+            if reference is not None:
+                self.compared += len(scores)
+                self.abs_diff_sum += float(np.sum(np.abs(scores - reference)))
+                self.agreements += int(np.sum((scores >= 50) == (reference >= 50)))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {
+                "batches": self.batches,
+                "rows": self.rows,
+                "avg_batch_ms": round(self.total_seconds / self.batches * 1000, 2) if self.batches else None,
+                "max_batch_ms": round(self.max_seconds * 1000, 2),
+                "mean_score": round(self.score_sum / self.rows, 2) if self.rows else None,
+                "score_histogram": {f"{i * 10}-{i * 10 + 10}": int(c) for i, c in enumerate(self.histogram)},
+            }
+            if self.compared:
+                stats["vs_active"] = {
+                    "compared": self.compared,
+                    "mean_abs_diff": round(self.abs_diff_sum / self.compared, 2),
+                    "decision_agreement": round(self.agreements / self.compared, 4),
+                }
+            return stats
+
+
+def _read_pointer(name: str, model_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(model_dir, name), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_pointer(name: str, version: Optional[str], model_dir: str):
+    path = os.path.join(model_dir, name)
+    if version is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(model_dir, exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def current_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    return _read_pointer("CURRENT", model_dir)
+
+
+def shadow_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    return _read_pointer("SHADOW", model_dir)
+
+
+def list_versions(model_dir: str = MODEL_DIR) -> List[dict]:
+    """meta.json of every saved version, oldest first (legacy is always available)."""
+    versions = []
+    if os.path.isdir(model_dir):
+        for name in sorted(os.listdir(model_dir)):
+            meta_path = os.path.join(model_dir, name, "meta.json")
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta.pop("sources", None)
+            versions.append(meta)
+    return versions
+
+
+def load_artifacts(version: str, model_dir: str = MODEL_DIR) -> ScorerArtifacts:
+    import joblib
+
+    if version == LEGACY_VERSION:
+        return ScorerArtifacts(LEGACY_VERSION, joblib.load(MODEL_PATH), joblib.load(SCALER_PATH), {"version": LEGACY_VERSION})
+    if version not in {meta["version"] for meta in list_versions(model_dir)}:
+        raise ValueError(f"Unknown model version: {version}")
+    directory = os.path.join(model_dir, version)
+    with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return ScorerArtifacts(
+        version,
+        joblib.load(os.path.join(directory, "model.pkl")),
+        joblib.load(os.path.join(directory, "scaler.pkl")),
+        meta,
+    )
+
+
+def save_artifacts(model, scaler, meta: dict, model_dir: str = MODEL_DIR) -> str:
+    """Write a new immutable version directory. Returns the version name."""
+    import joblib
+
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    tmp_dir = os.path.join(model_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    joblib.dump(model, os.path.join(tmp_dir, "model.pkl"))
+    joblib.dump(scaler, os.path.join(tmp_dir, "scaler.pkl"))
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(meta, version=version), f, indent=2)
+    os.replace(tmp_dir, os.path.join(model_dir, version))
+    return version
+
+
+def promote(version: str, model_dir: str = MODEL_DIR):
+    """Point CURRENT at version; running APIs pick it up on their next reload."""
+    _write_pointer("CURRENT", version, model_dir)
+
+
+class ModelRegistry:
+    """
+    Holds the lead scorer artifacts (XGBoost model, feature scaler) and the
+    sentence embedder. Nothing heavy is imported or loaded until load() runs,
+    which the API does in a background thread started from its lifespan.
+    Callers that need the models before that finishes can block on
+    ensure_loaded().
+
+    The model and scaler live in one immutable ScorerArtifacts object, so
+    swapping versions is a single assignment: a scoring call that already read
+    `active` finishes on the old pair. An optional shadow version scores the
+    same feature matrices on a background thread; its scores are only compared
+    and counted, never returned. The embedder is shared by every version.
+    """
+
+    def __init__(self, model_dir: str, embedder_name: str):
+        self.model_dir = model_dir
+        self.embedder_name = embedder_name
+        self.active: Optional[ScorerArtifacts] = None
+        self.shadow: Optional[ScorerArtifacts] = None
+        self.embedder = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._state_lock = threading.Lock()
+        self._stats: Dict[str, VersionStats] = {}
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-scorer")
+        self._shadow_pending = 0
+        self.shadow_dropped = 0
+        self.shadow_failures = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def load(self):
+        with self._lock:
+            if self._ready.is_set():
+                return
+            started = time.perf_counter()
+            try:
+                from sentence_transformers import SentenceTransformer
+
+                self.active = load_artifacts(current_version(self.model_dir) or LEGACY_VERSION, self.model_dir)
+                self.embedder = SentenceTransformer(self.embedder_name)
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"Failed to load lead scorer models: {self.error}")
+                raise
+            self.error = None
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self._ready.set()
+            print(f"Lead scorer models loaded in {self.load_seconds}s (version {self.active.version})")
+        self._sync_shadow()
+
+    def ensure_loaded(self):
+        if not self._ready.is_set():
+            self.load()
+
+    # --- Scoring ---
+    def _version_stats(self, version: str) -> VersionStats:
+        stats = self._stats.get(version)
+        if stats is None:
+            stats = self._stats.setdefault(version, VersionStats())
+        return stats
+
+    def score(self, X: np.ndarray) -> np.ndarray:
+        """Score with the active version, and queue the batch for the shadow version."""
+        artifacts, shadow = self.active, self.shadow
+        started = time.perf_counter()
+        scores = artifacts.score(X)
+        self._version_stats(artifacts.version).record(scores, time.perf_counter() - started)
+        if shadow is not None and shadow.version != artifacts.version:
+            self._submit_shadow(shadow, X, scores)
+        return scores
+
+    def _submit_shadow(self, shadow: ScorerArtifacts, X: np.ndarray, reference: np.ndarray):
+        # Shadow scoring must never slow the live path: drop batches when it falls behind
+        with self._state_lock:
+            if self._shadow_pending >= SHADOW_MAX_PENDING:
+                self.shadow_dropped += 1
+                return
+            self._shadow_pending += 1
+        self._shadow_executor.submit(self._score_shadow, shadow, X, reference)
+
+    def _score_shadow(self, shadow: ScorerArtifacts, X: np.ndarray, reference: np.ndarray):
+        try:
+            started = time.perf_counter()
+            scores = shadow.score(X)
+            self._version_stats(shadow.version).record(scores, time.perf_counter() - started, reference=reference)
+        except Exception as e:
+            self.shadow_failures += 1
+            print(f"Shadow scoring with version {shadow.version} failed: {type(e).__name__}: {e}")
+        finally:
+            with self._state_lock:
+                self._shadow_pending -= 1
+
+    # --- Version management ---
+    def _load_version(self, version: str) -> ScorerArtifacts:
+        for artifacts in (self.active, self.shadow):
+            if artifacts is not None and artifacts.version == version:
+                return artifacts
+        return load_artifacts(version, self.model_dir)
+
+    def activate(self, version: str):
+        """Load version, make it CURRENT for every worker and swap it in here."""
+        artifacts = self._load_version(version)
+        promote(version, self.model_dir)
+        with self._state_lock:
+            previous, self.active = self.active.version if self.active else None, artifacts
+        print(f"Lead scorer swapped from version {previous} to {version}")
+        if self.shadow is not None and self.shadow.version == version:
+            self.set_shadow(None)
+
+    def set_shadow(self, version: Optional[str]):
+        """Start shadow scoring version (None stops it); persisted in SHADOW."""
+        artifacts = self._load_version(version) if version else None
+        _write_pointer("SHADOW", version, self.model_dir)
+        self.shadow = artifacts
+        print(f"Shadow scoring {'stopped' if version is None else 'with version ' + version}")
+
+    def _sync_shadow(self):
+        version = shadow_version(self.model_dir)
+        if version == (self.shadow.version if self.shadow else None):
+            return
+        try:
+            self.shadow = self._load_version(version) if version else None
+        except Exception as e:
+            print(f"Failed to load shadow version {version}: {type(e).__name__}: {e}")
+
+    def reload(self) -> bool:
+        """Pick up CURRENT/SHADOW changes made by train.py or other workers. Returns True on swap."""
+        if not self.ready:
+            return False
+        self._sync_shadow()
+        version = current_version(self.model_dir) or LEGACY_VERSION
+        if version == self.active.version:
+            return False
+        try:
+            artifacts = self._load_version(version)
+        except Exception as e:
+            print(f"Failed to load lead scorer version {version}, keeping {self.active.version}: {type(e).__name__}: {e}")
+            return False
+        with self._state_lock:
+            previous, self.active = self.active.version, artifacts
+        print(f"Lead scorer swapped from version {previous} to {version}")
+        return True
+
+    async def watch(self, interval: float):
+        """Poll CURRENT and SHADOW and hot-swap changed versions (run as a task)."""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.reload)
+
+    def status(self) -> dict:
+        if self.ready:
+            state = "ready"
+        elif self.error:
+            state = "failed"
+        else:
+            state = "loading"
+        return {
+            "status": state,
+            "embedder": self.embedder_name,
+            "version": self.active.version if self.active else None,
+            "shadow_version": self.shadow.version if self.shadow else None,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active.version if self.active else None,
+            "shadow": self.shadow.version if self.shadow else None,
+            "shadow_pending": self._shadow_pending,
+            "shadow_dropped": self.shadow_dropped,
+            "shadow_failures": self.shadow_failures,
+            "version_stats": {version: stats.snapshot() for version, stats in list(self._stats.items())},
+        }
+
+
+registry = ModelRegistry(MODEL_DIR, EMBEDDING_MODEL_NAME)
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class PageStore:
+    """
+    Bounded in-memory store of page markdown keyed by URL.
+
+    The regex pre-filter pass keeps the content of every page that matched
+    here, so the LLM extraction step can run on it without fetching and
+    rendering the page a second time. Least recently used pages are evicted
+    once either the entry or the byte budget is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, url: str, content: str):
+        size = len(content.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if url in self._pages:
+                self._bytes -= len(self._pages.pop(url).encode("utf-8"))
+            self._pages[url] = content
+            self._bytes += size
+            while len(self._pages) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self._bytes -= len(evicted.encode("utf-8"))
+                self.evictions += 1
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            content = self._pages.get(url)
+            if content is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(url)
+            self.hits += 1
+            return content
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._pages),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,85 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordHashPool:
+    """
+    Runs password hashing and verification on a small dedicated thread pool.
+
+    pbkdf2 is deliberately slow; run inline in an async handler it stalls the
+    event loop for every request in flight. hashlib releases the GIL while it
+    hashes, so a thread pool keeps the loop free. At most max_workers hashes
+    run at once and at most max_queue more wait; past that callers get
+    PasswordPoolBusy immediately, so a login storm is shed instead of queuing
+    without bound.
+    """
+
+    def __init__(self, context, max_workers: int = 2, max_queue: int = 64):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_pending_seen = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    async def _run(self, fn: Callable, *args):
+        if self._pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        self._pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self._pending)
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.wait_seconds += started - submitted
+                self.hash_seconds += time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), timed)
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self.context.verify, password, password_hash)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_capacity": self.max_queue,
+            "running": min(self._pending, self.max_workers),
+            "queue_depth": max(0, self._pending - self.max_workers),
+            "max_pending_seen": self.max_pending_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_hash_ms": round(self.hash_seconds / self.completed * 1000, 1) if self.completed else None,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 1) if self.completed else None,
+        }
@@ -0,0 +1,118 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from caching import TTLCache, SingleFlight
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a user query: casefolded, whitespace collapsed, surrounding
+    quotes and punctuation stripped.
+    Example: '  Pharma companies in MUMBAI? ' -> 'pharma companies in mumbai'
+    """
+    return " ".join((text or "").casefold().split()).strip("\"'.,;:!? ")
+
+
+class QueryUnderstandingCache:
+    """
+    Shares query understanding across users and requests.
+
+    Results are kept in a TTLCache keyed by normalize_query(). On a miss,
+    concurrent requests for the same key are coalesced into one compute() call.
+    With a similarity_threshold > 0 and an encoder, a miss first embeds the
+    query and reuses the result of the closest cached query whose cosine
+    similarity reaches the threshold. Keep the threshold high: queries that
+    differ only by city embed very close to each other.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 21600,
+        similarity_threshold: float = 0.0,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ):
+        self.cache = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.flights = SingleFlight()
+        self.similarity_threshold = similarity_threshold
+        self.encoder = encoder
+        # Unit-length embeddings of computed (not alias) keys, in LRU order
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.similar_hits = 0
+        self.similarity_errors = 0
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self.similarity_threshold > 0 and self.encoder is not None
+
+    async def get_or_compute(self, query: str, compute: Callable[[str], Awaitable[Dict[str, str]]]) -> Dict[str, str]:
+        """
+        Cached understanding for query, calling compute(query) at most once per
+        key at a time. Exceptions from compute are not cached.
+        """
+        key = normalize_query(query)
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = await self.flights.do(key, lambda: self._resolve(key, query, compute))
+        return dict(cached)
+
+    async def _resolve(self, key: str, query: str, compute) -> Dict[str, str]:
+        vector = None
+        if self.similarity_enabled:
+            try:
+                vector = await asyncio.to_thread(self._embed, key)
+            except Exception as e:
+                self.similarity_errors += 1
+                print(f"Query embedding failed, skipping similarity lookup: {e}")
+            if vector is not None:
+                match = self._nearest(vector)
+                if match is not None:
+                    self.similar_hits += 1
+                    self.cache.put(key, match)
+                    return match
+
+        result = await compute(query)
+        self.cache.put(key, result)
+        if vector is not None:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.cache.max_entries:
+                self._vectors.popitem(last=False)
+        return result
+
+    def _embed(self, key: str) -> np.ndarray:
+        vector = np.asarray(self.encoder([key])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _nearest(self, vector: np.ndarray) -> Optional[Dict[str, str]]:
+        if not self._vectors:
+            return None
+        keys = list(self._vectors.keys())
+        similarities = np.stack(list(self._vectors.values())) @ vector
+        for i in np.argsort(-similarities):
+            if similarities[i] < self.similarity_threshold:
+                break
+            match = self.cache.peek(keys[i])
+            if match is not None:
+                self._vectors.move_to_end(keys[i])
+                return match
+            # Expired or evicted from the cache
+            del self._vectors[keys[i]]
+        return None
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "coalescing": self.flights.stats(),
+            "similarity": {
+                "enabled": self.similarity_enabled,
+                "threshold": self.similarity_threshold,
+                "indexed": len(self._vectors),
+                "hits": self.similar_hits,
+                "errors": self.similarity_errors,
+            },
+        }
@@ -0,0 +1,53 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets (for example one per account on /signin).
+
+    Each key may burst up to `burst` attempts, refilled at rate_per_minute.
+    allow() returns None when the attempt may proceed, else the seconds until
+    the next token. Only the max_keys most recently seen keys are tracked, so
+    memory stays bounded; an evicted key just starts again with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float = 10.0, burst: int = 5, max_keys: int = 100000):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def allow(self, key: Hashable) -> Optional[float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                tokens, updated = bucket
+                bucket[0] = min(float(self.burst), tokens + (now - updated) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                self.allowed += 1
+                return None
+            self.limited += 1
+            return (1.0 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+    def stats(self) -> dict:
+        return {
+            "tracked_keys": len(self._buckets),
+            "rate_per_minute": round(self.rate * 60, 2),
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
@@ -0,0 +1,274 @@
+import os
+import json
+import shutil
+import time
+import asyncio
+import itertools
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+
+class TrainingRecordWriter:
+    """
+    Write-behind buffer for ML training records.
+
+    Handlers call enqueue(), which only appends to an in-memory buffer. A
+    background task flushes the buffer through sink (a blocking callable run
+    in a worker thread) when it reaches flush_records or flush_bytes, or
+    every flush_interval seconds, so request latency never includes S3 I/O.
+
+    Records are never dropped: if a flush fails, or the buffer would grow past
+    max_pending_bytes (backpressure), they are appended to a local spill file.
+    The spill file is replayed on the next start, or after the next successful
+    flush, and deleted once its records have been flushed. Lines that do not
+    parse (e.g. cut off by a crash) are moved to spill_path + ".bad".
+
+    Several worker processes may share one spill file: appends and renames
+    take an flock on spill_path + ".lock", and only the process holding the
+    flock on spill_path + ".replay.lock" replays, so records are not
+    replayed twice.
+    """
+
+    def __init__(self, sink: Callable[[List[dict]], None], spill_path: str, flush_records: int = 200,
+                 flush_bytes: int = 1024 * 1024, flush_interval: float = 30.0, max_pending_bytes: int = 16 * 1024 * 1024):
+        self.sink = sink
+        self.spill_path = spill_path
+        self.flush_records = flush_records
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.max_pending_bytes = max_pending_bytes
+        self._buffer: List[dict] = []
+        self._buffer_bytes = 0
+        self._replay_path: Optional[str] = None
+        self._replay_lock = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.enqueued = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+        self.failures_since_success = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.malformed = 0
+        self.last_flush_seconds: Optional[float] = None
+
+    @staticmethod
+    def _size(record: dict) -> int:
+        return len(json.dumps(record, ensure_ascii=False).encode("utf-8")) + 1
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._replay_spill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None  # no spill replay during the final flush
+        await self.flush()
+        if self._buffer:
+            self._spill(self._take())
+        self._release_replay()
+
+    def enqueue(self, records: List[dict]):
+        if not records:
+            return
+        sizes = [self._size(r) for r in records]
+        self.enqueued += len(records)
+        if self._buffer_bytes + sum(sizes) > self.max_pending_bytes:
+            # Backpressure: keep memory bounded, the records wait on disk instead
+            self._spill(records)
+            return
+        self._buffer.extend(records)
+        self._buffer_bytes += sum(sizes)
+        if self._wakeup is not None and (len(self._buffer) >= self.flush_records or self._buffer_bytes >= self.flush_bytes):
+            self._wakeup.set()
+
+    def _take(self) -> List[dict]:
+        records, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        return records
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        replay_path, self._replay_path = self._replay_path, None
+        records = self._take()
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.sink, records)
+        except asyncio.CancelledError:
+            # Shutdown mid-flush: the batch may or may not have reached the sink, keep it on disk
+            self._spill(records)
+            if replay_path and os.path.exists(replay_path):
+                os.remove(replay_path)
+            self._release_replay()
+            raise
+        except Exception as e:
+            self.failures += 1
+            self.failures_since_success += 1
+            print(f"Training record flush failed, spilling {len(records)} record(s): {e}")
+            self._spill(records)
+        else:
+            self.failures_since_success = 0
+            self.flushes += 1
+            self.flushed += len(records)
+            self.last_flush_seconds = round(time.perf_counter() - started, 3)
+        # Replayed records are either flushed or back in the spill file now
+        if replay_path and os.path.exists(replay_path):
+            os.remove(replay_path)
+        if replay_path:
+            self._release_replay()
+        # The sink is healthy again: drain records spilled under backpressure
+        if self.failures_since_success == 0 and os.path.exists(self.spill_path) and self._wakeup is not None:
+            self._replay_spill()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    # --- Spill file ---
+    @contextmanager
+    def _spill_lock(self):
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.spill_path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _claim_replay(self) -> bool:
+        """Take the replay flock without blocking; False if another process is replaying."""
+        if self._replay_lock is not None:
+            return True
+        lock = open(self.spill_path + ".replay.lock", "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                return False
+        self._replay_lock = lock
+        return True
+
+    def _release_replay(self):
+        if self._replay_lock is not None:
+            self._replay_lock.close()
+            self._replay_lock = None
+
+    def _spill(self, records: List[dict]):
+        with self._spill_lock():
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        self.spilled += len(records)
+
+    def _replay_spill(self):
+        """
+        Move spilled records from a previous run back into the buffer, up to
+        max_pending_bytes. Records past that are written back to the spill file
+        and replayed after the next successful flush.
+        """
+        replay_path = self.spill_path + ".replay"
+        with self._spill_lock():
+            if not self._claim_replay():
+                # Another worker owns the replay and drains the spill file after its flushes
+                return
+            records = self._load_replay(replay_path)
+        if not records:
+            self._release_replay()
+            return
+        self._replay_path = replay_path
+        self._wakeup.set()
+
+    def _load_replay(self, replay_path: str) -> List[dict]:
+        if os.path.exists(self.spill_path):
+            if os.path.exists(replay_path):
+                # A previous replay never completed: fold the new spill into it
+                with open(self.spill_path, "r", encoding="utf-8") as src, open(replay_path, "a", encoding="utf-8") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.spill_path)
+            else:
+                os.replace(self.spill_path, replay_path)
+        if not os.path.exists(replay_path):
+            return []
+        records: List[dict] = []
+        loaded_lines: List[str] = []
+        loaded_bytes = 0
+        overflow = 0
+        malformed = 0
+        with open(replay_path, "r", encoding="utf-8") as f:
+            lines = (line if line.endswith("\n") else line + "\n" for line in f if line.strip())
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Partial or corrupt line: keep it out of the buffer but do not lose it
+                    with open(self.spill_path + ".bad", "a", encoding="utf-8") as bad:
+                        bad.write(line)
+                    malformed += 1
+                    continue
+                size = self._size(record)
+                if records and self._buffer_bytes + loaded_bytes + size > self.max_pending_bytes:
+                    # Over budget: stream this line and the rest back to the spill file unparsed
+                    with open(self.spill_path, "a", encoding="utf-8") as rest:
+                        for left in itertools.chain([line], lines):
+                            rest.write(left)
+                            overflow += 1
+                    break
+                records.append(record)
+                loaded_lines.append(line)
+                loaded_bytes += size
+        if overflow or malformed:
+            # The replay file now owns only the loaded records
+            with open(replay_path + ".tmp", "w", encoding="utf-8") as f:
+                f.writelines(loaded_lines)
+            os.replace(replay_path + ".tmp", replay_path)
+        if not records:
+            os.remove(replay_path)
+        if malformed:
+            self.malformed += malformed
+            print(f"Skipped {malformed} malformed spilled training record(s), kept in {self.spill_path}.bad")
+        self._buffer.extend(records)
+        self._buffer_bytes += loaded_bytes
+        self.replayed += len(records)
+        if records:
+            print(f"Replaying {len(records)} spilled training record(s)" + (f", {overflow} left on disk" if overflow else ""))
+        return records
+
+    def stats(self) -> dict:
+        return {
+            "pending_records": len(self._buffer),
+            "pending_bytes": self._buffer_bytes,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "malformed": self.malformed,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
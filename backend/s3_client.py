@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "10"))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "standard")
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "5"))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "30"))
+
+
+class S3Metrics:
+    """
+    Per-operation S3 call counters (calls, errors, retries, latency), fed by
+    botocore event hooks so every call made through an instrumented client is
+    counted, including ones from helpers that never see the metrics object.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, float]] = {}
+
+    def instrument(self, client):
+        events = client.meta.events
+        events.register("before-call.s3", self._before_call)
+        events.register("after-call.s3", self._after_call)
+        events.register("after-call-error.s3", self._after_call_error)
+
+    @staticmethod
+    def _operation(event_name: str) -> str:
+        return event_name.rsplit(".", 1)[-1]
+
+    def _record(self, operation: str, started: Optional[float], error: bool, retries: int = 0):
+        elapsed = time.perf_counter() - started if started else 0.0
+        with self._lock:
+            op = self._ops.setdefault(operation, {"calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            op["calls"] += 1
+            op["errors"] += 1 if error else 0
+            op["retries"] += retries
+            op["total_seconds"] += elapsed
+            op["max_seconds"] = max(op["max_seconds"], elapsed)
+
+    def _before_call(self, context=None, **kwargs):
+        if context is not None:
+            context["metrics_started"] = time.perf_counter()
+
+    def _after_call(self, event_name, http_response=None, parsed=None, context=None, **kwargs):
+        retries = ((parsed or {}).get("ResponseMetadata") or {}).get("RetryAttempts", 0)
+        status = getattr(http_response, "status_code", 0) or 0
+        self._record(self._operation(event_name), (context or {}).get("metrics_started"), error=status >= 300, retries=retries)
+
+    def _after_call_error(self, event_name, context=None, **kwargs):
+        self._record(self._operation(event_name), (context or {}).get("metrics_started"), error=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "calls": int(op["calls"]),
+                    "errors": int(op["errors"]),
+                    "retries": int(op["retries"]),
+                    "avg_ms": round(op["total_seconds"] / op["calls"] * 1000, 1) if op["calls"] else 0.0,
+                    "max_ms": round(op["max_seconds"] * 1000, 1),
+                }
+                for name, op in self._ops.items()
+            }
+
+
+def create_s3_client(region: Optional[str] = None, metrics: Optional[S3Metrics] = None,
+                     max_pool_connections: int = S3_MAX_POOL_CONNECTIONS, max_attempts: int = S3_MAX_ATTEMPTS,
+                     retry_mode: str = S3_RETRY_MODE):
+    """
+    S3 client with an explicit connection pool size, retry policy and timeouts.
+    boto3 clients are thread-safe, so one client can be shared by every caller.
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={"max_attempts": max_attempts, "mode": retry_mode},
+        connect_timeout=S3_CONNECT_TIMEOUT,
+        read_timeout=S3_READ_TIMEOUT,
+    )
+    session = boto3.session.Session(region_name=region) if region else boto3.session.Session()
+    client = session.client("s3", config=config)
+    if metrics is not None:
+        metrics.instrument(client)
+    return client
+
+
+class SharedS3Client:
+    """
+    Process-wide S3 client: created once (in the FastAPI lifespan, or lazily
+    on first use by scripts) and reused, so credential resolution, endpoint
+    setup and TLS connections are not repeated per call.
+    """
+
+    def __init__(self, region: Optional[str] = None):
+        self.region = region
+        self.metrics = S3Metrics()
+        self._client = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._client is None:
+                self._client = create_s3_client(self.region, metrics=self.metrics)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
@@ -18,7 +18,7 @@ class PerSourceResult(BaseModel):
     socials: List[str]
     summary: str = Field(default="", description="Website summary for this source")
     contacts: List[ContactInfo]
-    fit_score: float = Field(default=0.0, description="Fit score percentage for the lead")
+    fit_score: Optional[float] = Field(default=0.0, description="Fit score percentage for the lead (None if scoring failed)")
     response_id: Optional[int] = Field(None, description="Database ID for feedback")
 
 
@@ -69,3 +69,27 @@ class EmailResponse(BaseModel):
     body: str
 
 
+
+
+class JobProgress(BaseModel):
+    completed: int = 0
+    total: Optional[int] = None
+
+
+class ExtractionJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, completed or failed")
+    query_text: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: JobProgress
+    contacts_found: Dict[str, PerSourceResult] = Field(default_factory=dict, description="Per-source results completed so far")
+    errors: Dict[str, str] = Field(default_factory=dict)
+    query_id: Optional[int] = Field(None, description="Stored query id once the job has completed")
+    error: Optional[str] = None
+    deduplicated: bool = Field(False, description="True if an identical running job was returned")
+
+
+class ModelVersionRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Model version name; null stops shadow scoring")
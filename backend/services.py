@@ -1,14 +1,22 @@
 import os
-from typing import List, Dict
+import asyncio
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from urllib.parse import urlparse, urljoin, urlunparse
 from dotenv import load_dotenv
 from exa_py import Exa
 from crawl4ai import (
     AsyncWebCrawler,
     CrawlerRunConfig,
+    RegexExtractionStrategy,
 )
-import litellm
 import json
+from page_store import PageStore
+from crawl_cache import CrawlCache
+from crawl_scheduler import CrawlScheduler
+from query_cache import QueryUnderstandingCache
+from exa_search import ExaSearchCache, FakeExa
+from llm_gateway import llm_gateway
+from lead_scorer import encode_texts
 
 load_dotenv()
 
@@ -41,8 +49,54 @@ class LinkProcessor:
 
 
 crawler = AsyncWebCrawler()
-    
-exa = Exa(api_key=os.getenv("EXA_API_KEY"))
+
+# All crawls go through the scheduler: global cap, per-host cap and delay, round-robin across hosts
+crawl_scheduler = CrawlScheduler(
+    crawler,
+    max_concurrency=int(os.getenv("CRAWL_MAX_CONCURRENCY", "10")),
+    per_host_concurrency=int(os.getenv("CRAWL_PER_HOST_CONCURRENCY", "2")),
+    min_host_delay=float(os.getenv("CRAWL_MIN_HOST_DELAY_SECONDS", "1.0")),
+    max_host_delay=float(os.getenv("CRAWL_MAX_HOST_DELAY_SECONDS", "30")),
+)
+
+# EXA_FAKE_DATA points at a lead JSONL to search offline (tests, local runs) instead of the Exa API
+EXA_FAKE_DATA = os.getenv("EXA_FAKE_DATA")
+exa = FakeExa(EXA_FAKE_DATA) if EXA_FAKE_DATA else Exa(api_key=os.getenv("EXA_API_KEY"))
+EXA_NUM_RESULTS = int(os.getenv("EXA_NUM_RESULTS", "5"))
+
+# Exa results and summaries shared across users, keyed by (optimized query, location code, num_results)
+exa_cache = ExaSearchCache(
+    exa,
+    max_entries=int(os.getenv("EXA_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("EXA_CACHE_TTL_SECONDS", "3600")),
+    type="auto",
+    category="company",
+    summary=True,
+    livecrawl="fallback",
+)
+
+# Markdown of pages that passed the regex pre-filter, reused by LLM extraction
+page_store = PageStore(
+    max_entries=int(os.getenv("PAGE_STORE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("PAGE_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+LLM_EXTRACTION_CONCURRENCY = int(os.getenv("LLM_EXTRACTION_CONCURRENCY", "5"))
+
+# Crawl results shared across users and queries (footer links, socials, page markdown)
+crawl_cache = CrawlCache(
+    path=os.getenv("CRAWL_CACHE_PATH", ".cache/crawl_cache.sqlite3"),
+    ttl_seconds=int(os.getenv("CRAWL_CACHE_TTL_SECONDS", "86400")),
+    max_entries=int(os.getenv("CRAWL_CACHE_MAX_ENTRIES", "20000")),
+)
+CONTACT_PATTERN_KEY = "regex:email|phone_us"
+
+# Query understanding shared across users; near-duplicate lookup is off unless a threshold is set
+query_cache = QueryUnderstandingCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "21600")),
+    similarity_threshold=float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0")),
+    encoder=encode_texts,
+)
 
 
 async def understand_user_query(user_query: str) -> Dict[str, str]:
@@ -53,7 +107,23 @@ async def understand_user_query(user_query: str) -> Dict[str, str]:
     - location: Geographic preference if mentioned
     - key_requirements: Specific requirements or characteristics
     - optimized_query: A refined search query for Exa API
+    Results are shared through query_cache; the fallback structure is never cached.
     """
+    try:
+        return await query_cache.get_or_compute(user_query, _understand_with_llm)
+    except Exception as e:
+        print(f"Error understanding query with Gemini: {e}")
+        # Fallback to basic query structure
+        return {
+            "target_audience": "businesses",
+            "industry": "general",
+            "location": "India",
+            "key_requirements": user_query,
+            "optimized_query": f"{user_query} official website -crunchbase -linkedin -directory"
+        }
+
+
+async def _understand_with_llm(user_query: str) -> Dict[str, str]:
     prompt = f"""You are an intelligent business search assistant. Our platform helps businesses connect by providing contact information of relevant companies.
 
 Analyze the following user query and extract structured information:
@@ -89,37 +159,11 @@ Response:
 
 Now analyze the user query and respond with JSON only."""
 
-    try:
-        response = await litellm.acompletion(
-            model="gemini/gemini-2.0-flash",
-            messages=[{"role": "user", "content": prompt}],
-            api_key=os.getenv("GEMINI_API_KEY")
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Remove markdown code blocks if present
-        if content.startswith("```json"):
-            content = content[7:]
-        elif content.startswith("```"):
-            content = content[3:]
-        if content.endswith("```"):
-            content = content[:-3]
-        
-        content = content.strip()
-        understanding = json.loads(content)
-        
-        return understanding
-    except Exception as e:
-        print(f"Error understanding query with Gemini: {e}")
-        # Fallback to basic query structure
-        return {
-            "target_audience": "businesses",
-            "industry": "general",
-            "location": "India",
-            "key_requirements": user_query,
-            "optimized_query": f"{user_query} official website -crunchbase -linkedin -directory"
-        }
+    # query_cache already dedupes these, so skip the gateway's prompt cache
+    understanding = await llm_gateway.complete_json(prompt, purpose="query_understanding", cache=False)
+    if not isinstance(understanding, dict):
+        raise ValueError(f"Expected a JSON object, got {type(understanding).__name__}")
+    return understanding
 
 
 async def search_with_exa(user_query: str) -> tuple[List[str], Dict[str, str]]:
@@ -135,104 +179,198 @@ async def search_with_exa(user_query: str) -> tuple[List[str], Dict[str, str]]:
     location = understanding.get("location", "India")
     location_code = "IN" if "india" in location.lower() else "IN"  # Default to India
     
-    result = exa.search_and_contents(
-        search_query,
-        type="auto",
-        category="company",
-        user_location=location_code,
-        num_results=5,
-        summary=True,
-        livecrawl = "fallback"
-    )
+    results = await exa_cache.search(search_query, location_code, num_results=EXA_NUM_RESULTS)
     print(f"search: {search_query}")
-    print(f"Exa Search Results: {result}")
+    print(f"Exa Search Results: {[item['url'] for item in results]}")
     
     base_urls = []
     summaries = {}
     seen = set()
-    for item in result.results:
-        url = item.url
+    for item in results:
+        url = item["url"]
         homepage = normalize_to_homepage(url)
         if homepage not in seen:
             seen.add(homepage)
             base_urls.append(homepage)
             # Enrich summary with understanding context
-            enriched_summary = f"Target: {understanding.get('target_audience', 'N/A')} | Industry: {understanding.get('industry', 'N/A')}\n\n{item.summary or ''}"
+            enriched_summary = f"Target: {understanding.get('target_audience', 'N/A')} | Industry: {understanding.get('industry', 'N/A')}\n\n{item['summary'] or ''}"
             summaries[homepage] = enriched_summary
     return base_urls, summaries
 
 
+FOOTER_SELECTOR = "footer, #footer, .footer, [role='contentinfo']"
+
+
+def _dedupe_social_links(external_links: List[str]) -> List[str]:
+    seen_hrefs = set()
+    dedup_socials = []
+    for href in external_links:
+        try:
+            if not href or not LinkProcessor.is_social_media(href) or href in seen_hrefs:
+                continue
+        except Exception:
+            continue
+        seen_hrefs.add(href)
+        dedup_socials.append(href)
+    return dedup_socials
+
+
+async def _crawl_links(stage: str, urls: List[str], config: CrawlerRunConfig, config_key: str) -> tuple[Dict[str, dict], Dict[str, str]]:
+    """
+    Internal/external links for each URL, served from crawl_cache when fresh
+    and crawled (then cached) otherwise. Returns ({url: {"internal", "external"}}, {url: error}).
+    """
+    links: Dict[str, dict] = {}
+    failures: Dict[str, str] = {}
+    links.update(await asyncio.to_thread(crawl_cache.get_many, stage, urls, config_key))
+    to_crawl = [url for url in urls if url not in links]
+    if not to_crawl:
+        return links, failures
+
+    async for result in crawl_scheduler.arun_many(to_crawl, config=config):
+        if result.success:
+            entry = {
+                "internal": [urljoin(result.url, link.get('href', '')) for link in result.links.get("internal", [])],
+                "external": [link.get('href', '') for link in result.links.get("external", [])],
+            }
+            await asyncio.to_thread(crawl_cache.put, stage, result.url, entry, config_key)
+            links[result.url] = entry
+        else:
+            failures[result.url] = result.error_message
+    return links, failures
+
+
 async def get_important_internal_links(base_urls: List[str]) -> tuple[Dict[str, List[str]], Dict[str, List[str]], Dict[str, str]]:
-    primary_config = CrawlerRunConfig(
-        css_selector="footer, #footer, .footer, [role='contentinfo']",
-        stream=True
-    )
-    
     important_links_map: Dict[str, List[str]] = {}
     social_links_map: Dict[str, List[str]] = {}
     errors: Dict[str, str] = {}
     urls_needing_fallback: List[str] = []
 
-    async for result in await crawler.arun_many(base_urls, config=primary_config):
-        if result.success:
-            internal_links = [urljoin(result.url, link.get('href', '')) for link in result.links.get("internal", [])]
-            external_links = [link.get('href', '') for link in result.links.get("external", [])]
-            
-            if internal_links:
-                important_links_map[result.url] = LinkProcessor.process_important_links(internal_links)
-            social_links = []
-            for href in external_links:
-                try:
-                    if href and LinkProcessor.is_social_media(href):
-                        social_links.append(href)
-                except Exception:
-                    continue
-            if social_links:
-                seen_hrefs = set()
-                dedup_socials = []
-                for href in social_links:
-                    if href in seen_hrefs:
-                        continue
-                    seen_hrefs.add(href)
-                    dedup_socials.append(href)
-                social_links_map[result.url] = dedup_socials
-            else:
-                urls_needing_fallback.append(result.url)
+    primary_config = CrawlerRunConfig(css_selector=FOOTER_SELECTOR, stream=True)
+    footer_links, failures = await _crawl_links("footer", base_urls, primary_config, FOOTER_SELECTOR)
+    for url, message in failures.items():
+        errors[url] = f"Failed to get footer links on first pass: {message}"
+    for url, entry in footer_links.items():
+        if entry["internal"]:
+            important_links_map[url] = LinkProcessor.process_important_links(entry["internal"])
+        social_links = _dedupe_social_links(entry["external"])
+        if social_links:
+            social_links_map[url] = social_links
         else:
-            errors[result.url] = f"Failed to get footer links on first pass: {result.error_message}"
+            urls_needing_fallback.append(url)
 
     if urls_needing_fallback:
         fallback_config = CrawlerRunConfig(stream=True)
-        
-        async for result in await crawler.arun_many(urls_needing_fallback, config=fallback_config):
-            if result.success:
-                all_internal_links = [urljoin(result.url, link.get('href', '')) for link in result.links.get("internal", [])]
-                all_external_links = [link.get('href', '') for link in result.links.get("external", [])]
-                footer_proxy_links = all_internal_links[-40:]
-                
-                important_links_map[result.url] = LinkProcessor.process_important_links(footer_proxy_links)
-                social_links = []
-                for href in all_external_links:
-                    try:
-                        if href and LinkProcessor.is_social_media(href):
-                            social_links.append(href)
-                    except Exception:
-                        continue
-                if social_links:
-                    seen_hrefs = set()
-                    dedup_socials = []
-                    for href in social_links:
-                        if href in seen_hrefs:
-                            continue
-                        seen_hrefs.add(href)
-                        dedup_socials.append(href)
-                    social_links_map[result.url] = dedup_socials
-            else:
-                errors[result.url] = f"Failed to get footer links on fallback pass: {result.error_message}"
+        page_links, failures = await _crawl_links("fallback", urls_needing_fallback, fallback_config, "full-page")
+        for url, message in failures.items():
+            errors[url] = f"Failed to get footer links on fallback pass: {message}"
+        for url, entry in page_links.items():
+            footer_proxy_links = entry["internal"][-40:]
+            important_links_map[url] = LinkProcessor.process_important_links(footer_proxy_links)
+            social_links = _dedupe_social_links(entry["external"])
+            if social_links:
+                social_links_map[url] = social_links
 
     return important_links_map, social_links_map, errors
 
 
+def page_markdown(result) -> str:
+    """
+    Best markdown available on a crawl result: fit_markdown when a content
+    filter produced one, otherwise the raw markdown.
+    """
+    markdown = result.markdown
+    if not markdown:
+        return ""
+    return getattr(markdown, "fit_markdown", None) or getattr(markdown, "raw_markdown", None) or str(markdown)
+
+
+async def find_pages_with_contacts(urls: List[str]) -> List[str]:
+    """
+    Regex pre-filter: crawl each URL once and keep those whose content contains
+    email or phone patterns. The markdown of matching pages is kept in
+    page_store so extract_contacts_from_pages does not need to re-crawl them.
+    Verdicts and markdown are cached in crawl_cache, so fresh pages skip the crawl.
+    """
+    urls_with_contacts = []
+    to_crawl = []
+    cached_pages = await asyncio.to_thread(crawl_cache.get_many, "contact_page", urls, CONTACT_PATTERN_KEY)
+    for url in urls:
+        cached = cached_pages.get(url)
+        if cached is None:
+            to_crawl.append(url)
+        elif cached["has_contacts"]:
+            page_store.put(url, cached["markdown"])
+            urls_with_contacts.append(url)
+    if not to_crawl:
+        return urls_with_contacts
+
+    regex_config = CrawlerRunConfig(
+        extraction_strategy=RegexExtractionStrategy(
+            pattern=RegexExtractionStrategy.Email | RegexExtractionStrategy.PhoneUS
+        ),
+        stream=True
+    )
+    async for result in crawl_scheduler.arun_many(to_crawl, config=regex_config):
+        if not result.success:
+            continue
+        has_contacts = bool(result.extracted_content and json.loads(result.extracted_content))
+        markdown = page_markdown(result) if has_contacts else ""
+        await asyncio.to_thread(crawl_cache.put, "contact_page", result.url, {"has_contacts": has_contacts, "markdown": markdown}, CONTACT_PATTERN_KEY)
+        if has_contacts:
+            page_store.put(result.url, markdown)
+            urls_with_contacts.append(result.url)
+    return urls_with_contacts
+
+
+async def extract_contacts_from_pages(urls: List[str], extract: Callable[[str, str], Awaitable[object]]) -> List[Tuple[str, Optional[list], Optional[str]]]:
+    """
+    Run extract(url, markdown) (the LLM step) on pages kept by
+    find_pages_with_contacts, without another browser load. Pages that were
+    evicted from the store in the meantime are crawled again for their markdown.
+    Returns (url, extracted items, error) tuples.
+    """
+    semaphore = asyncio.Semaphore(LLM_EXTRACTION_CONCURRENCY)
+
+    async def run_on_page(url: str, content: str):
+        async with semaphore:
+            try:
+                return url, await extract(url, content), None
+            except json.JSONDecodeError as e:
+                return url, None, f"LLM result parsing error: {str(e)}"
+            except Exception as e:
+                return url, None, f"LLM extraction error: {str(e)}"
+
+    stored = {}
+    refetch = []
+    for url in urls:
+        content = page_store.get(url)
+        if content:
+            stored[url] = content
+        else:
+            refetch.append(url)
+
+    if refetch:
+        async for result in crawl_scheduler.arun_many(refetch, config=CrawlerRunConfig(stream=True)):
+            content = page_markdown(result) if result.success else ""
+            if content:
+                stored[result.url] = content
+
+    return list(await asyncio.gather(*(run_on_page(url, content) for url, content in stored.items())))
+
+
+def company_domain(url: str) -> str:
+    """
+    Domain used to key company profiles: lowercase host without port or "www.".
+    Example: https://WWW.Example.com:443/about -> example.com
+    """
+    try:
+        host = (urlparse(url).hostname or url).lower()
+    except (ValueError, TypeError):
+        return url
+    return host[4:] if host.startswith("www.") else host
+
+
 def normalize_to_homepage(url: str) -> str:
     """
     Reduce any URL to its homepage: scheme + netloc with trailing slash.
@@ -0,0 +1,144 @@
+import time
+import asyncio
+
+import pytest
+
+from caching import TTLCache, SingleFlight
+from query_cache import QueryUnderstandingCache, normalize_query
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(max_entries=10, ttl_seconds=0.05)
+    cache.put("token", "user")
+    assert cache.get("token") == "user"
+    time.sleep(0.1)
+    assert cache.get("token") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_per_entry_ttl_is_capped_by_cache_ttl():
+    cache = TTLCache(max_entries=10, ttl_seconds=0.05)
+    cache.put("token", "user", ttl=3600)
+    time.sleep(0.1)
+    assert cache.get("token") is None
+
+
+def test_zero_ttl_disables_cache():
+    cache = TTLCache(max_entries=10, ttl_seconds=0)
+    cache.put("token", "user")
+    assert cache.get("token") is None
+
+
+def test_invalidate_tag_drops_every_entry_for_the_tag():
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    cache.put("token-a", "alice", tag="alice@example.com")
+    cache.put("token-b", "alice", tag="alice@example.com")
+    cache.put("token-c", "bob", tag="bob@example.com")
+
+    assert cache.invalidate_tag("alice@example.com") == 2
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is None
+    assert cache.get("token-c") == "bob"
+    assert cache.invalidate_tag("alice@example.com") == 0
+
+
+def test_lru_eviction_keeps_tags_consistent():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1, tag="t")
+    cache.put("b", 2, tag="t")
+    cache.get("a")
+    cache.put("c", 3, tag="t")  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.invalidate_tag("t") == 2
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+        return flights, results
+
+    flights, results = asyncio.run(run())
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_errors_and_does_not_keep_them():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def ok():
+        return "recovered"
+
+    async def run():
+        flights = SingleFlight()
+        outcomes = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+        return outcomes, await flights.do("key", ok)
+
+    outcomes, retried = asyncio.run(run())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert retried == "recovered"
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        flights = SingleFlight()
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+
+
+def test_query_cache_coalesces_normalized_queries():
+    calls = []
+
+    async def understand(query):
+        calls.append(query)
+        await asyncio.sleep(0.02)
+        return {"optimized_query": "pharma mumbai"}
+
+    async def run():
+        cache = QueryUnderstandingCache(max_entries=10, ttl_seconds=60)
+        queries = ["Pharma in Mumbai", "  pharma in MUMBAI? ", "pharma in mumbai"]
+        first = await asyncio.gather(*(cache.get_or_compute(q, understand) for q in queries))
+        again = await cache.get_or_compute("PHARMA IN MUMBAI", understand)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"optimized_query": "pharma mumbai"} for result in first + [again])
+    assert normalize_query("  Pharma companies in MUMBAI? ") == "pharma companies in mumbai"
+
+
+def test_query_cache_does_not_cache_failures():
+    async def fail(query):
+        raise ValueError("bad JSON")
+
+    async def understand(query):
+        return {"optimized_query": query}
+
+    async def run():
+        cache = QueryUnderstandingCache(max_entries=10, ttl_seconds=60)
+        with pytest.raises(ValueError):
+            await cache.get_or_compute("crm tools", fail)
+        return await cache.get_or_compute("crm tools", understand)
+
+    assert asyncio.run(run()) == {"optimized_query": "crm tools"}
@@ -0,0 +1,68 @@
+import json
+import asyncio
+
+import pytest
+
+from exa_search import ExaSearchCache, FakeExa
+
+
+@pytest.fixture
+def fake_exa(tmp_path):
+    path = tmp_path / "leads.jsonl"
+    records = [
+        {"url": "https://www.asianprinters.com", "title": "Asian Printers", "org_summary": "Textile printing equipment in Bangalore", "location": "Bangalore, India"},
+        {"url": "https://www.pharmaone.in", "title": "Pharma One", "org_summary": "Pharmaceutical distribution in Mumbai", "location": "Mumbai, India"},
+        {"url": "https://www.printhub.in", "title": "Print Hub", "org_summary": "Digital printing services", "location": "Pune, India"},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+    return FakeExa(str(path), latency_seconds=0.05)
+
+
+def test_fake_exa_ranks_by_word_overlap_and_ignores_operators(fake_exa):
+    response = fake_exa.search_and_contents("textile printing bangalore -crunchbase", num_results=2)
+    assert [item.url for item in response.results] == ["https://www.asianprinters.com", "https://www.printhub.in"]
+    assert fake_exa.calls[0]["num_results"] == 2
+
+
+def test_concurrent_identical_searches_share_one_call(fake_exa):
+    cache = ExaSearchCache(fake_exa, max_entries=10, ttl_seconds=60, type="auto", summary=True)
+
+    async def run():
+        return await asyncio.gather(*(cache.search("textile printing", "IN", num_results=2) for _ in range(8)))
+
+    results = asyncio.run(run())
+    assert len(fake_exa.calls) == 1
+    assert fake_exa.calls[0]["user_location"] == "IN"
+    assert fake_exa.calls[0]["type"] == "auto"
+    assert all(r == results[0] for r in results)
+    assert cache.stats()["coalescing"]["coalesced"] == 7
+
+
+def test_cached_results_are_reused_until_expiry(fake_exa):
+    cache = ExaSearchCache(fake_exa, max_entries=10, ttl_seconds=0.2)
+
+    async def run():
+        await cache.search("pharma mumbai", "IN", num_results=1)
+        hit = await cache.search("pharma mumbai", "IN", num_results=1)
+        await cache.search("pharma mumbai", "IN", num_results=2)  # different key
+        await asyncio.sleep(0.25)
+        await cache.search("pharma mumbai", "IN", num_results=1)
+        return hit
+
+    hit = asyncio.run(run())
+    assert hit[0]["url"] == "https://www.pharmaone.in"
+    assert len(fake_exa.calls) == 3
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["est_saved_seconds"] > 0
+
+
+def test_returned_results_are_copies(fake_exa):
+    cache = ExaSearchCache(fake_exa, max_entries=10, ttl_seconds=60)
+
+    async def run():
+        first = await cache.search("pharma mumbai", "IN", num_results=1)
+        first[0]["summary"] = "edited by caller"
+        return await cache.search("pharma mumbai", "IN", num_results=1)
+
+    assert asyncio.run(run())[0]["summary"] == "Pharmaceutical distribution in Mumbai"
@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+litellm = pytest.importorskip("litellm")
+
+import llm_gateway
+from llm_gateway import LLMGateway, parse_json_response
+
+
+def _reply(content: str):
+    message = SimpleNamespace(content=content)
+    usage = SimpleNamespace(prompt_tokens=12, completion_tokens=4)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _rate_limited():
+    return litellm.RateLimitError(message="quota exceeded", llm_provider="gemini", model="gemini-2.0-flash")
+
+
+class FakeProvider:
+    """Replaces litellm.acompletion: raises the queued errors first, then replies."""
+
+    def __init__(self, errors=(), content='{"ok": true}', delay=0.0):
+        self.errors = list(errors)
+        self.content = content
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, **kwargs):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return _reply(self.content)
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Records the backoff ceilings and skips the actual waiting."""
+    ceilings = []
+
+    def uniform(low, high):
+        ceilings.append(high)
+        return 0.0
+
+    monkeypatch.setattr(llm_gateway.random, "uniform", uniform)
+    return ceilings
+
+
+def test_parse_json_response_strips_fences():
+    assert parse_json_response('```json\n{"subject": "Hi"}\n```') == {"subject": "Hi"}
+    assert parse_json_response("Here you go:\n```\n[1, 2]\n```") == [1, 2]
+    assert parse_json_response(' {"a": 1} ') == {"a": 1}
+
+
+def test_429_is_retried_with_exponential_jittered_backoff(monkeypatch, backoffs):
+    provider = FakeProvider(errors=[_rate_limited(), _rate_limited()])
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", provider)
+    gateway = LLMGateway(backoff_base_seconds=1.0, backoff_max_seconds=30.0)
+
+    assert asyncio.run(gateway.complete_json("prompt", purpose="test")) == {"ok": True}
+    assert provider.calls == 3
+    assert backoffs == [1.0, 2.0]
+    stats = gateway.stats()["by_purpose"]["test"]
+    assert stats["retries"] == 2
+    assert stats["prompt_tokens"] == 12
+    assert stats["completion_tokens"] == 4
+
+
+def test_429_retries_stop_at_max_retries(monkeypatch, backoffs):
+    provider = FakeProvider(errors=[_rate_limited() for _ in range(5)])
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", provider)
+    gateway = LLMGateway(max_retries=2)
+
+    with pytest.raises(litellm.RateLimitError):
+        asyncio.run(gateway.complete("prompt", purpose="test"))
+    assert provider.calls == 3
+    assert gateway.stats()["by_purpose"]["test"]["errors"] == 1
+
+
+def test_other_errors_are_not_retried(monkeypatch, backoffs):
+    provider = FakeProvider(errors=[ValueError("bad request")])
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", provider)
+    gateway = LLMGateway()
+
+    with pytest.raises(ValueError):
+        asyncio.run(gateway.complete("prompt"))
+    assert provider.calls == 1
+    assert backoffs == []
+
+
+def test_identical_prompts_share_one_call_and_are_cached(monkeypatch):
+    provider = FakeProvider(delay=0.02)
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", provider)
+    gateway = LLMGateway()
+
+    async def run():
+        await asyncio.gather(*(gateway.complete("prompt", purpose="test") for _ in range(4)))
+        await gateway.complete("prompt", purpose="test")
+        await gateway.complete("prompt", purpose="test", cache=False)
+
+    asyncio.run(run())
+    assert provider.calls == 2
+    assert gateway.stats()["by_purpose"]["test"]["cache_hits"] == 1
+
+
+def test_unparseable_replies_are_not_cached(monkeypatch):
+    provider = FakeProvider(content="not json")
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", provider)
+    gateway = LLMGateway()
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(gateway.complete_json("prompt"))
+    assert provider.calls == 2
+
+
+def test_per_model_concurrency_is_capped(monkeypatch):
+    active = []
+    peak = []
+
+    async def acompletion(**kwargs):
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.pop()
+        return _reply("{}")
+
+    monkeypatch.setattr(llm_gateway.litellm, "acompletion", acompletion)
+    gateway = LLMGateway(max_concurrency=8, model_concurrency=2)
+
+    async def run():
+        await asyncio.gather(*(gateway.complete(f"prompt {i}") for i in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
@@ -0,0 +1,48 @@
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucketLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_limited(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=3)
+    assert [limiter.allow("alice") for _ in range(3)] == [None, None, None]
+    assert limiter.allow("alice") == pytest.approx(1.0)
+    assert limiter.stats()["limited"] == 1
+
+
+def test_tokens_refill_at_rate(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=2)
+    limiter.allow("alice")
+    limiter.allow("alice")
+    assert limiter.allow("alice") is not None
+
+    clock[0] += 1.0  # one token per second
+    assert limiter.allow("alice") is None
+    assert limiter.allow("alice") is not None
+
+    clock[0] += 60.0  # refill never exceeds the burst
+    assert [limiter.allow("alice") for _ in range(2)] == [None, None]
+    assert limiter.allow("alice") is not None
+
+
+def test_keys_have_separate_buckets(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1)
+    assert limiter.allow(("signin", "alice")) is None
+    assert limiter.allow(("signin", "alice")) is not None
+    assert limiter.allow(("signin", "bob")) is None
+
+
+def test_tracked_keys_are_bounded(clock):
+    limiter = TokenBucketLimiter(rate_per_minute=60, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.allow(key)
+    assert limiter.stats()["tracked_keys"] == 2
+    assert limiter.allow("a") is None  # evicted, starts again with a full bucket
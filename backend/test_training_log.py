@@ -0,0 +1,114 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+moto = pytest.importorskip("moto")
+import boto3
+
+from training_log import SegmentedJsonlLog
+
+BUCKET = "outreach-test"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def log(s3):
+    return SegmentedJsonlLog(s3, BUCKET, prefix="training_log")
+
+
+def test_each_append_writes_a_new_part(log):
+    first = log.append([{"n": 1}, {"n": 2}])
+    second = log.append([{"n": 3}])
+
+    assert first != second
+    assert first.startswith("training_log/parts/dt=")
+    assert log.append([]) is None
+    assert [r["n"] for r in log.iter_records()] == [1, 2, 3]
+
+
+def test_concurrent_appends_keep_every_record(log):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        keys = list(pool.map(lambda n: log.append([{"n": n}]), range(40)))
+
+    assert len(set(keys)) == 40
+    assert sorted(r["n"] for r in log.iter_records()) == list(range(40))
+
+
+def test_legacy_object_is_read_first(s3):
+    s3.put_object(Bucket=BUCKET, Key="legacy.jsonl", Body=b'{"n": 0}\n')
+    log = SegmentedJsonlLog(s3, BUCKET, prefix="training_log", legacy_key="legacy.jsonl")
+    log.append([{"n": 1}])
+
+    assert [r["n"] for r in log.iter_records()] == [0, 1]
+
+
+def test_compact_merges_parts_into_a_segment(log):
+    for n in range(5):
+        log.append([{"n": n}])
+
+    segment = log.compact(min_age_seconds=0)
+
+    assert segment.startswith("training_log/segments/")
+    assert log.list_parts() == []
+    manifest = log.read_manifest()
+    assert [s["key"] for s in manifest["segments"]] == [segment]
+    assert manifest["segments"][0]["parts"] == 5
+    assert log.object_keys() == [segment]
+    assert [r["n"] for r in log.iter_records()] == list(range(5))
+    assert log.compact(min_age_seconds=0) is None
+
+
+def test_compact_leaves_recent_parts(log):
+    log.append([{"n": 1}])
+    assert log.compact(min_age_seconds=3600) is None
+    assert len(log.list_parts()) == 1
+
+
+def test_parts_listed_in_the_manifest_are_skipped(log, s3):
+    log.append([{"n": 1}])
+    consumed = log.append([{"n": 2}])
+    s3.put_object(
+        Bucket=BUCKET,
+        Key=log.manifest_key,
+        Body=json.dumps({"segments": [], "compacted_parts": [consumed]}).encode("utf-8"),
+    )
+
+    assert consumed not in log.object_keys()
+    assert [r["n"] for r in log.iter_records()] == [1]
+
+
+def test_interrupted_compaction_does_not_duplicate_records(log, s3, monkeypatch):
+    for n in range(3):
+        log.append([{"n": n}])
+
+    delete_objects = s3.delete_objects
+
+    def crash(**kwargs):
+        raise RuntimeError("compactor died before deleting parts")
+
+    # Segment and manifest are written, the parts are not deleted
+    monkeypatch.setattr(s3, "delete_objects", crash)
+    with pytest.raises(RuntimeError):
+        log.compact(min_age_seconds=0)
+    monkeypatch.setattr(s3, "delete_objects", delete_objects)
+
+    assert len(log.list_parts()) == 3
+    assert [r["n"] for r in log.iter_records()] == [0, 1, 2]
+
+    # New appends are still read; the next compaction only takes them and forgets deleted parts
+    log.append([{"n": 3}])
+    assert [r["n"] for r in log.iter_records()] == [0, 1, 2, 3]
+    second = log.compact(min_age_seconds=0)
+    manifest = log.read_manifest()
+    assert [(s["key"], s["parts"]) for s in manifest["segments"]][-1] == (second, 1)
+    assert [r["n"] for r in log.iter_records()] == [0, 1, 2, 3]
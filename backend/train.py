@@ -0,0 +1,171 @@
+"""
+Scriptable retraining for the XGBoost lead scorer.
+
+Reads the Parquet features written by export_training_data.py and writes a new
+versioned model + scaler pair with model_registry.save_artifacts. The version
+is promoted (models/CURRENT) only if it scores at least as well as the current
+model on the holdout (PROMOTE_METRIC), or with --force; running APIs hot-swap
+to it on their next reload poll. After evaluation the candidate is refitted on
+every row, holdout included, since all of them are recorded as seen.
+
+Modes:
+    incremental  Continue boosting the current model for --rounds trees on
+                 sources it has not seen yet. The scaler is kept fixed so the
+                 existing trees stay valid. Cost scales with the new data only.
+    window       Retrain from scratch on the last --window-days of data with
+                 the current model's hyperparameters (and its base tree count,
+                 not the rounds added by incremental runs) and a refitted scaler.
+    full         Same as window over every exported row (use once to bootstrap).
+
+    python export_training_data.py --compact && python train.py
+    python train.py --mode window --window-days 90
+"""
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from export_training_data import TRAINING_FEATURES_DIR, feature_arrays, load_feature_table, load_state
+from model_registry import MODEL_DIR, LEGACY_VERSION, current_version, load_artifacts, promote, save_artifacts
+
+# Holdout metric a candidate must match or beat to be promoted (higher is better)
+PROMOTE_METRIC = "f1_macro"
+
+
+def _split(X: np.ndarray, y: np.ndarray, holdout: float):
+    """Train/holdout split, stratified when both classes have enough rows."""
+    from sklearn.model_selection import train_test_split
+
+    if holdout <= 0 or len(y) < 10:
+        return X, None, y, None
+    stratify = y if np.bincount(y, minlength=2).min() >= 2 else None
+    return train_test_split(X, y, test_size=holdout, random_state=42, stratify=stratify)
+
+
+def _evaluate(model, scaler, X: np.ndarray, y: np.ndarray) -> dict:
+    from sklearn.metrics import accuracy_score, f1_score, log_loss
+
+    probabilities = model.predict_proba(scaler.transform(X))[:, 1]
+    predictions = (probabilities >= 0.5).astype(int)
+    return {
+        "rows": int(len(y)),
+        "accuracy": round(float(accuracy_score(y, predictions)), 4),
+        "f1_macro": round(float(f1_score(y, predictions, average="macro", zero_division=0)), 4),
+        "log_loss": round(float(log_loss(y, probabilities, labels=[0, 1])), 4),
+    }
+
+
+def _hyperparameters(parent) -> dict:
+    """
+    The parent's XGBoost parameters, minus anything tied to its fitted state.
+    n_estimators is the base tree count of a from-scratch fit, kept in meta
+    because incremental runs fit with n_estimators set to their round count.
+    """
+    params = parent.model.get_params()
+    for key in ("n_jobs", "missing", "callbacks"):
+        params.pop(key, None)
+    params["n_estimators"] = parent.meta.get("n_estimators", params.get("n_estimators"))
+    return params
+
+
+def main():
+    from xgboost import XGBClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    parser = argparse.ArgumentParser(description="Retrain the lead scorer from exported Parquet features.")
+    parser.add_argument("--mode", choices=["incremental", "window", "full"], default="incremental")
+    parser.add_argument("--features", default=TRAINING_FEATURES_DIR, help="Exported features directory")
+    parser.add_argument("--model-dir", default=MODEL_DIR, help="Versioned model directory (default env MODEL_DIR)")
+    parser.add_argument("--rounds", type=int, default=25, help="incremental: trees added per run")
+    parser.add_argument("--window-days", type=int, default=90, help="window: days of data to train on")
+    parser.add_argument("--min-rows", type=int, default=20, help="Skip training with fewer labeled rows than this")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of rows held out for evaluation")
+    parser.add_argument("--no-promote", action="store_true", help="Write the version without making it current")
+    parser.add_argument("--force", action="store_true", help=f"Promote even if the holdout {PROMOTE_METRIC} is worse than the current model's")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    parent = load_artifacts(current_version(args.model_dir) or LEGACY_VERSION, args.model_dir)
+    exported = set(load_state(args.features)["exported"])
+    seen = set(parent.meta.get("sources", []))
+
+    if args.mode == "incremental":
+        new_sources = sorted(exported - seen)
+        table = load_feature_table(args.features, sources=new_sources) if new_sources else None
+    elif args.mode == "window":
+        min_dt = (datetime.utcnow() - timedelta(days=args.window_days)).strftime("%Y-%m-%d")
+        table = load_feature_table(args.features, min_dt=min_dt)
+    else:
+        table = load_feature_table(args.features)
+
+    if table is None or table.num_rows < args.min_rows:
+        print(f"Not enough new labeled rows to train ({0 if table is None else table.num_rows} < {args.min_rows}), keeping version {parent.version}")
+        return
+    X, y = feature_arrays(table)
+    if len(np.unique(y)) < 2:
+        print(f"Training rows contain a single class, keeping version {parent.version}")
+        return
+    X_train, X_holdout, y_train, y_holdout = _split(X, y, args.holdout)
+    params = _hyperparameters(parent)
+    base_estimators = params["n_estimators"]
+
+    def fit(X_fit: np.ndarray, y_fit: np.ndarray):
+        if args.mode == "incremental":
+            # Keep the parent's scaler: its trees split on features scaled this way
+            scaler = parent.scaler
+            # With xgb_model, n_estimators is the number of rounds added on top of the parent's booster
+            model = XGBClassifier(**{**params, "n_estimators": args.rounds})
+            model.fit(scaler.transform(X_fit), y_fit, xgb_model=parent.model.get_booster())
+            # Predictions use every tree in the booster; keep the base count in the saved params
+            model.set_params(n_estimators=base_estimators)
+        else:
+            # Fixed hyperparameters instead of a grid search; class weighting instead of SMOTE
+            scaler = StandardScaler().fit(X_fit)
+            negatives, positives = np.bincount(y_fit, minlength=2)
+            model = XGBClassifier(**{**params, "scale_pos_weight": float(negatives) / positives if positives else 1.0})
+            model.fit(scaler.transform(X_fit), y_fit)
+        return model, scaler
+
+    model, scaler = fit(X_train, y_train)
+    metrics = {}
+    if X_holdout is not None:
+        metrics["candidate"] = _evaluate(model, scaler, X_holdout, y_holdout)
+        metrics["parent"] = _evaluate(parent.model, parent.scaler, X_holdout, y_holdout)
+        # Holdout sources are marked as seen below, so refit on every row or they would never be trained on
+        model, scaler = fit(X, y)
+
+    meta = {
+        "parent": parent.version,
+        "mode": args.mode,
+        "created_at": datetime.utcnow().isoformat(),
+        "train_rows": int(len(y)),
+        "total_trees": int(model.get_booster().num_boosted_rounds()),
+        "n_estimators": base_estimators,
+        "features": int(X.shape[1]),
+        "embedding_model": table.column("embedding_model")[0].as_py(),
+        # Everything exported so far counts as seen, so the next incremental run starts after it
+        "sources": sorted(exported | seen),
+        "metrics": metrics,
+        "train_seconds": round(time.perf_counter() - started, 2),
+    }
+    version = save_artifacts(model, scaler, meta, args.model_dir)
+    print(f"Trained version {version} ({args.mode}, {len(y)} rows, {meta['train_seconds']}s) from {parent.version}")
+    for name, values in metrics.items():
+        print(f"  {name}: {values}")
+    if args.no_promote:
+        return
+    if not args.force:
+        if not metrics:
+            print(f"No holdout to compare against {parent.version}, not promoting {version} (use --force to promote anyway)")
+            return
+        candidate, current = metrics["candidate"][PROMOTE_METRIC], metrics["parent"][PROMOTE_METRIC]
+        if candidate < current:
+            print(f"Holdout {PROMOTE_METRIC} {candidate} < {current} of {parent.version}, not promoting {version} (use --force to promote anyway)")
+            return
+    promote(version, args.model_dir)
+    print(f"Promoted {version}; running APIs swap to it on their next reload")
+
+
+if __name__ == "__main__":
+    main()
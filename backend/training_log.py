@@ -0,0 +1,195 @@
+"""
+Append-only, segmented JSONL training log in S3.
+
+Layout under the configured prefix:
+    <prefix>/parts/dt=YYYY-MM-DD/<timestamp>-<uuid>.jsonl   one object per append
+    <prefix>/segments/<timestamp>-<uuid>.jsonl              compacted parts
+    <prefix>/manifest.json                                  segments + parts they absorbed
+
+Every append writes a new, uniquely named part object, so it costs only the
+bytes it adds and concurrent writers can never overwrite each other. The
+compaction job merges parts older than a cutoff into a segment, records them
+in the manifest, then deletes them; readers skip any part the manifest lists,
+so a compaction that dies half-way never duplicates records. Run a single
+compactor at a time (cron or `python training_log.py compact`).
+
+The legacy single-object log (S3_JSONL_KEY) is still read first, if present.
+"""
+import os
+import json
+import uuid
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+S3_JSONL_PREFIX = os.getenv("S3_JSONL_PREFIX", "training_log")
+
+
+def _missing(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") in ("NoSuchKey", "NoSuchBucket", "404")
+
+
+def encode_records(records: List[dict]) -> bytes:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+
+class SegmentedJsonlLog:
+    def __init__(self, s3, bucket: str, prefix: str = S3_JSONL_PREFIX, legacy_key: Optional[str] = None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.legacy_key = legacy_key
+
+    # --- Keys ---
+    @property
+    def manifest_key(self) -> str:
+        return f"{self.prefix}/manifest.json"
+
+    @staticmethod
+    def _stamp(now: datetime) -> str:
+        return f"{now.strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:12]}"
+
+    def _part_key(self, now: datetime) -> str:
+        return f"{self.prefix}/parts/dt={now.strftime('%Y-%m-%d')}/{self._stamp(now)}.jsonl"
+
+    def _segment_key(self, now: datetime) -> str:
+        return f"{self.prefix}/segments/{self._stamp(now)}.jsonl"
+
+    # --- Writes ---
+    def append(self, records: List[dict]) -> Optional[str]:
+        """Write records as a new part object. Returns the part key."""
+        if not records:
+            return None
+        key = self._part_key(datetime.now(timezone.utc))
+        self.append_bytes(key, encode_records(records))
+        return key
+
+    def append_bytes(self, key: str, body: bytes):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=body, ContentType="application/x-ndjson")
+
+    # --- Reads ---
+    def _read(self, key: str) -> bytes:
+        try:
+            return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except ClientError as e:
+            if _missing(e):
+                return b""
+            raise
+
+    def read_manifest(self) -> dict:
+        blob = self._read(self.manifest_key)
+        if not blob:
+            return {"segments": [], "compacted_parts": []}
+        return json.loads(blob.decode("utf-8"))
+
+    def list_parts(self) -> List[dict]:
+        """Part objects (Key, LastModified, Size) in key (= time) order."""
+        parts = []
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/parts/"):
+            parts.extend(page.get("Contents", []))
+        return sorted(parts, key=lambda p: p["Key"])
+
+    def object_keys(self) -> List[str]:
+        """Every object holding live records, oldest first."""
+        manifest = self.read_manifest()
+        consumed = set(manifest["compacted_parts"])
+        keys = [self.legacy_key] if self.legacy_key else []
+        keys += [s["key"] for s in manifest["segments"]]
+        keys += [p["Key"] for p in self.list_parts() if p["Key"] not in consumed]
+        return keys
+
+    def iter_lines(self, key: str) -> Iterator[str]:
+        for line in self._read(key).decode("utf-8", errors="replace").splitlines():
+            if line.strip():
+                yield line
+
+    def iter_records(self) -> Iterator[dict]:
+        for key in self.object_keys():
+            for line in self.iter_lines(key):
+                yield json.loads(line)
+
+    # --- Compaction ---
+    def compact(self, min_age_seconds: int = 300) -> Optional[str]:
+        """
+        Merge parts older than min_age_seconds into one segment. Returns the new
+        segment key, or None if there was nothing to compact.
+        """
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=min_age_seconds)
+        manifest = self.read_manifest()
+        consumed = set(manifest["compacted_parts"])
+        all_parts = self.list_parts()
+        # Forget consumed parts that are already deleted, so the manifest stays small
+        live_keys = {p["Key"] for p in all_parts}
+        manifest["compacted_parts"] = [k for k in manifest["compacted_parts"] if k in live_keys]
+
+        parts = [p for p in all_parts if p["Key"] not in consumed and p["LastModified"] <= cutoff]
+        if not parts:
+            return None
+        body = b"".join(self._read(p["Key"]) for p in parts)
+        segment_key = self._segment_key(now)
+        self.append_bytes(segment_key, body)
+
+        manifest["segments"].append({
+            "key": segment_key,
+            "parts": len(parts),
+            "bytes": len(body),
+            "created_at": now.isoformat(),
+        })
+        manifest["compacted_parts"].extend(p["Key"] for p in parts)
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=self.manifest_key,
+            Body=json.dumps(manifest, indent=2).encode("utf-8"),
+            ContentType="application/json",
+        )
+        for i in range(0, len(parts), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": p["Key"]} for p in parts[i:i + 1000]], "Quiet": True},
+            )
+        return segment_key
+
+
+def main():
+    from dotenv import load_dotenv
+    from s3_client import create_s3_client
+
+    parser = argparse.ArgumentParser(description="Inspect or compact the segmented S3 training log.")
+    parser.add_argument("command", choices=["compact", "stats", "cat"])
+    parser.add_argument("--bucket", default=None, help="S3 bucket name (overrides env S3_BUCKET_NAME)")
+    parser.add_argument("--prefix", default=None, help="Log prefix (overrides env S3_JSONL_PREFIX)")
+    parser.add_argument("--region", default=None, help="AWS region (overrides env AWS_REGION)")
+    parser.add_argument("--min-age", type=int, default=300, help="Only compact parts older than this many seconds")
+    args = parser.parse_args()
+
+    load_dotenv()
+    bucket = args.bucket or os.getenv("S3_BUCKET_NAME", "outreachdata")
+    region = args.region or os.getenv("AWS_REGION")
+    log = SegmentedJsonlLog(
+        create_s3_client(region),
+        bucket,
+        args.prefix or os.getenv("S3_JSONL_PREFIX", S3_JSONL_PREFIX),
+        legacy_key=os.getenv("S3_JSONL_KEY", "b2b_lead_data_india.jsonl"),
+    )
+
+    if args.command == "compact":
+        segment = log.compact(min_age_seconds=args.min_age)
+        print(f"Wrote segment s3://{bucket}/{segment}" if segment else "Nothing to compact")
+    elif args.command == "stats":
+        manifest = log.read_manifest()
+        parts = log.list_parts()
+        print(f"Segments: {len(manifest['segments'])}")
+        print(f"Uncompacted parts: {len([p for p in parts if p['Key'] not in set(manifest['compacted_parts'])])}")
+        print(f"Part bytes: {sum(p['Size'] for p in parts)}")
+    else:
+        for key in log.object_keys():
+            for line in log.iter_lines(key):
+                print(line)
+
+
+if __name__ == "__main__":
+    main()